@@ -1,62 +1,224 @@
+import json
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from .database import get_db
-from .models import User, DomainMemory
-from .memory_engine import MemoryKeepEngine
-from .gemma_client import generate_response
+from .database import get_db, SessionLocal, get_pool_stats
+from .models import User
+from typing import Dict, Optional
+from .domain_engine import DomainEngine, profile_cache
+from .memory_engine import MemoryKeepEngine, fetch_domain_profile, fetch_past_snippets
+from .gemma_client import generate_reply, stream_reply, analyze_turn, model_pool_stats, model_router, FUSED_TURN_ANALYSIS
+from .memory_compaction import run_compaction, COMPACTION_MERGE
+from .workers import intake_queue, memory_keep_queue, compaction_queue
+from .retrieval_gate import retrieval_gate
+from .intake_filter import importance_filter
+from .assess_batcher import assess_batcher
+from .llm_scheduler import llm_scheduler, LLMUnavailableError
+from .turn_pipeline import TurnPipeline, stage_stats
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     user_id: int
     message: str
+    deep_search: bool = False  # Also search archived (compacted) Experience Memory
 
 class SignupRequest(BaseModel):
     email: str
     password: str
 
+class DomainFactsRequest(BaseModel):
+    facts: Dict[str, str]
+
 class ChatResponse(BaseModel):
     reply: str
     token_count: int = 0
-    authority_tokens: int = 0
+    authority_tokens: int = 0  # 27B tokens of this turn's fused analysis; background assessments show in /intake/stats
     sifter_tokens: int = 0
     capacity_pct: float = 0.0
+    timings: Dict[str, float] = {}
+    model: str = ""  # Model that wrote the reply (27B, or 4B when degraded)
+
+def _plan_context(pipeline: TurnPipeline, engine: MemoryKeepEngine, request: ChatRequest):
+    """Adds the stages that end in a ready prompt ("context") to a turn pipeline."""
+    # Intake, domain and retrieval run side by side
+    pipeline.stage("domain", lambda r: fetch_domain_profile(request.user_id))
+    if FUSED_TURN_ANALYSIS:
+        # One 27B call decides importance + retrieval; None means fall back to the split calls.
+        pipeline.stage("analysis", lambda r: analyze_turn(request.message, user_id=request.user_id))
+        pipeline.stage("intake", lambda r: engine.intake_valve(
+            "user", request.message, assessment=r["analysis"]
+        ), after=("analysis",))
+        pipeline.stage("retrieval", lambda r: fetch_past_snippets(
+            request.user_id, request.message, decision=r["analysis"], deep=request.deep_search
+        ), after=("analysis",))
+    else:
+        pipeline.stage("intake", lambda r: engine.intake_valve("user", request.message))
+        pipeline.stage("retrieval", lambda r: fetch_past_snippets(
+            request.user_id, request.message, deep=request.deep_search
+        ))
+    
+    # Load Context (Core + Directives + Domain + Experience + Stream)
+    pipeline.stage("context", lambda r: engine.load_context(
+        user_message=request.message, profile=r["domain"], past_snippets=r["retrieval"]
+    ), after=("intake", "domain", "retrieval"))
+    return pipeline
+
+def _finish_turn(engine: MemoryKeepEngine, reply: str):
+    engine.intake_valve("assistant", reply)
+    engine.commit_turn()
 
 @router.post("/chat", response_model=ChatResponse)
 def chat_endpoint(request: ChatRequest, db: Session = Depends(get_db)):
-    # 1. Initialize Engine
-    engine = MemoryKeepEngine(db, request.user_id)
+    # 1. Initialize Engine (one unit of work: the turn's writes land in a single commit)
+    engine = MemoryKeepEngine(db, request.user_id, unit_of_work=True)
     
-    # 2. Intake User Message
-    engine.intake_valve("user", request.message)
+    # 2. Turn as a dependency graph, up to a ready prompt
+    pipeline = _plan_context(TurnPipeline(), engine, request)
     
-    # 3. Load Context (Core + Directives + Experience + Stream)
-    context = engine.load_context(user_message=request.message)
+    # 3. Generate Reply via Gemma 3 27B (or 4B while the router has it degraded) -> (reply, model)
+    pipeline.stage("generate", lambda r: generate_reply(r["context"], user_id=request.user_id), after=("context",))
     
-    # 4. Generate Reply via Gemma 3 27B
-    reply = generate_response(context)
+    # 4. Intake AI Reply + commit the turn (a failed generation never gets here)
+    pipeline.stage("reply_intake", lambda r: _finish_turn(engine, r["generate"][0]), after=("generate",))
     
-    # 5. Intake AI Reply
-    engine.intake_valve("assistant", reply)
+    # 5. Get token stats for frontend
+    pipeline.stage("stats", lambda r: engine.get_token_stats(), after=("reply_intake",))
     
-    # 6. Get token stats for frontend
-    stats = engine.get_token_stats()
+    try:
+        results = pipeline.run()
+    except LLMUnavailableError as e:
+        # Nothing of the turn is kept; the client may retry the same message
+        engine.rollback_turn()
+        raise HTTPException(status_code=503, detail=f"Lux is temporarily unavailable: {e}")
+    except Exception:
+        engine.rollback_turn()
+        raise
+    stats = results["stats"]
+    reply, model = results["generate"]
     
     return {
         "reply": reply,
         "token_count": stats["stream_tokens"],
         "authority_tokens": stats["authority_tokens"],
         "sifter_tokens": stats["sifter_tokens"],
-        "capacity_pct": stats["capacity_pct"]
+        "capacity_pct": stats["capacity_pct"],
+        "timings": pipeline.timings,
+        "model": model
     }
 
+def _sse(event: str, payload: dict):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@router.post("/chat/stream")
+def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-Sent Events variant of /chat: `chunk` events carry reply text as Gemma streams it,
+    the assembled reply is taken in by the Intake Valve afterwards, and `stats` closes the stream.
+    """
+    # The session outlives this function (the body streams later), so it is owned by the generator.
+    db = SessionLocal()
+    try:
+        engine = MemoryKeepEngine(db, request.user_id, unit_of_work=True)
+        pipeline = _plan_context(TurnPipeline(), engine, request)
+        context = pipeline.run()["context"]
+    except Exception:
+        db.close()
+        raise
+
+    def events():
+        try:
+            parts, model = [], ""
+            try:
+                # 27B, or 4B when degraded / when the 27B fails before its first chunk
+                for text, model in stream_reply(context, user_id=request.user_id):
+                    parts.append(text)
+                    yield _sse("chunk", {"text": text})
+            except Exception as e:
+                print(f"Gemini Stream Error: {e}")
+                engine.rollback_turn()
+                yield _sse("error", {"message": str(e)})
+                return
+
+            # Only a finished turn enters the Stream: user message + reply in one commit
+            reply = "".join(parts)
+            engine.intake_valve("assistant", reply)
+            engine.commit_turn()
+            stats = engine.get_token_stats()
+            yield _sse("stats", {
+                "token_count": stats["stream_tokens"],
+                "authority_tokens": stats["authority_tokens"],
+                "sifter_tokens": stats["sifter_tokens"],
+                "capacity_pct": stats["capacity_pct"],
+                "timings": pipeline.timings,
+                "model": model
+            })
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/tokens/{user_id}")
 def get_token_stats(user_id: int, db: Session = Depends(get_db)):
     """Returns current token stats for a user. Sidecar tokens excluded from reboot."""
     engine = MemoryKeepEngine(db, user_id)
     return engine.get_token_stats()
 
+@router.get("/intake/stats")
+def get_intake_stats():
+    """Background intake queue health (depth, failures, latency), pre-filter savings and batch histograms."""
+    return {**intake_queue.stats(), "filter": importance_filter.stats(), "batcher": assess_batcher.stats()}
+
+@router.get("/keep/stats")
+def get_memory_keep_stats():
+    """Background Memory Keep queue: depth, deduplicated triggers, lease conflicts, sifter tokens (+ compaction queue)."""
+    return {**memory_keep_queue.stats(), "compaction": compaction_queue.stats()}
+
+@router.post("/memory/compact")
+def compact_memories(user_id: Optional[int] = None, merge: bool = COMPACTION_MERGE):
+    """Runs an Experience Memory compaction sweep now (one user, or everyone) and returns its counts."""
+    return run_compaction(user_id, merge=merge)
+
+@router.get("/retrieval/stats")
+def get_retrieval_gate_stats():
+    """Retrieval gate counters: heuristic / cache / LLM-fallback decisions."""
+    return retrieval_gate.stats()
+
+@router.get("/turn/stats")
+def get_turn_stats():
+    """Rolling per-stage chat turn latency (p50 / p95 / max, ms)."""
+    return stage_stats()
+
+@router.get("/llm/scheduler")
+def get_llm_scheduler_stats():
+    """LLM call scheduler: per-lane queue depth and wait time, retries, bucket levels per model."""
+    return llm_scheduler.stats()
+
+@router.get("/llm/router")
+def get_model_router_stats():
+    """Model router: breaker state, routed calls per model, rolling p95 latency and error rate."""
+    return model_router.stats()
+
+@router.get("/llm/pool")
+def get_model_pool_stats():
+    """LLM provider: which backend, plus its client pool (google) or simulated calls / errors (fake, http)."""
+    return model_pool_stats()
+
+@router.get("/domain/stats")
+def get_profile_cache_stats():
+    """Domain profile cache: hits, misses, invalidations and current size."""
+    return profile_cache.stats()
+
+@router.get("/db/pool")
+def get_db_pool_stats():
+    """Active engine profile and connection pool stats (checked out, overflow, wait time)."""
+    return get_pool_stats()
+
 @router.post("/auth/signup")
 def signup(request: SignupRequest, db: Session = Depends(get_db)):
     from .security import get_password_hash
@@ -66,18 +228,22 @@ def signup(request: SignupRequest, db: Session = Depends(get_db)):
         return {"status": "User already exists", "user_id": existing_user.id}
         
     hashed_password = get_password_hash(request.password)
-    user = User(email=request.email, password_hash=hashed_password, username=request.email.split("@")[0])
+    user = User(email=request.email, password_hash=hashed_password, username=request.email.split("@")[0], stream_tokens=0)
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
 
-    # Mandatory Domain Memory (Job Memory) - stored directly regardless of LLM
-    db.add(DomainMemory(user_id=user.id, key="username", value=user.username))
-    db.add(DomainMemory(user_id=user.id, key="email", value=user.email))
+    # Mandatory Domain Memory (Job Memory) - stored directly regardless of LLM, same transaction as the user
+    DomainEngine(db, user.id).upsert_facts({"username": user.username, "email": user.email}, commit=False)
     db.commit()
 
     return {"status": "User created", "user_id": user.id}
 
+@router.put("/domain/{user_id}")
+def upsert_domain_facts(user_id: int, request: DomainFactsRequest, db: Session = Depends(get_db)):
+    """Bulk import of structured domain facts (profile / lead data) in one transaction."""
+    count = DomainEngine(db, user_id).upsert_facts(request.facts)
+    return {"status": "Domain facts saved", "user_id": user_id, "upserted": count}
+
 @router.post("/auth/login")
 def login(request: SignupRequest, db: Session = Depends(get_db)):
     from .security import verify_password
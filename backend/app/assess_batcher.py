@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import Future, ThreadPoolExecutor
+from . import gemma_client
+
+# Configuration — Micro-batched importance assessment
+ASSESS_BATCH_SIZE = int(os.getenv("ASSESS_BATCH_SIZE", "1"))           # Max messages per 27B prompt; 1 = no batching
+ASSESS_BATCH_WAIT_MS = float(os.getenv("ASSESS_BATCH_WAIT_MS", "50"))  # Max time the first message waits for company
+ASSESS_BATCH_CONCURRENCY = int(os.getenv("ASSESS_BATCH_CONCURRENCY", "4"))  # Batches in flight at once
+# Callers block until their verdict is back, so batches only fill when INTAKE_WORKERS >= ASSESS_BATCH_SIZE.
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64]
+WAIT_MS_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 1000]
+
+
+def _histogram(buckets):
+    return {**{f"<={b}": 0 for b in buckets}, f">{buckets[-1]}": 0}
+
+
+def _observe(histogram, buckets, value):
+    i = bisect_left(buckets, value)
+    histogram[f"<={buckets[i]}" if i < len(buckets) else f">{buckets[-1]}"] += 1
+
+
+class AssessmentBatcher:
+    """
+    Collects pending importance assessments — from any user — for up to `max_items` messages
+    or `max_wait_ms`, sends one structured 27B prompt, and hands each caller its own verdict.
+    """
+
+    def __init__(self, max_items: int = ASSESS_BATCH_SIZE, max_wait_ms: float = ASSESS_BATCH_WAIT_MS,
+                 concurrency: int = ASSESS_BATCH_CONCURRENCY):
+        self.max_items = max_items
+        self.max_wait = max_wait_ms / 1000.0
+        self.concurrency = concurrency
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._executor = None
+        self._counters = {"batches": 0, "messages": 0, "fallbacks": 0}
+        self._batch_sizes = _histogram(BATCH_SIZE_BUCKETS)
+        self._wait_ms = _histogram(WAIT_MS_BUCKETS)
+
+    def assess(self, role: str, content: str, user_id=None):
+        """Drop-in for assess_importance(role, content, user_id); blocks until the batch it joined returns."""
+        if self.max_items <= 1:
+            return gemma_client.assess_importance(role, content, user_id=user_id)
+        self._start()
+        future = Future()
+        self._queue.put((role, content, user_id, future, time.perf_counter()))
+        return future.result()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="assess-batch")
+                self._thread = threading.Thread(target=self._collect, name="assess-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        while True:
+            # 1. Block for the first message, then gather more until full or its deadline passes
+            batch = [self._queue.get()]
+            deadline = batch[0][4] + self.max_wait
+            while len(batch) < self.max_items:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # 2. Ship it; the next batch starts collecting right away
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        dispatched = time.perf_counter()
+        with self._lock:
+            self._counters["batches"] += 1
+            self._counters["messages"] += len(batch)
+            _observe(self._batch_sizes, BATCH_SIZE_BUCKETS, len(batch))
+            for *_, enqueued_at in batch:
+                _observe(self._wait_ms, WAIT_MS_BUCKETS, (dispatched - enqueued_at) * 1000)
+
+        try:
+            if len(batch) == 1:
+                verdicts = [gemma_client.assess_importance(batch[0][0], batch[0][1], user_id=batch[0][2])]
+            else:
+                # One call for many users: it queues under the oldest message's user
+                verdicts = gemma_client.assess_importance_batch(
+                    [(role, content) for role, content, _, _, _ in batch], user_id=batch[0][2]
+                )
+
+            # 3. Demultiplex; a message the batch reply dropped gets a single call of its own
+            for (role, content, user_id, future, _), verdict in zip(batch, verdicts):
+                if verdict is None:
+                    with self._lock:
+                        self._counters["fallbacks"] += 1
+                    verdict = gemma_client.assess_importance(role, content, user_id=user_id)
+                future.set_result(verdict)
+        except Exception as e:
+            for _, _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def stats(self):
+        with self._lock:
+            batches = self._counters["batches"]
+            return {
+                "max_items": self.max_items,
+                "max_wait_ms": self.max_wait * 1000,
+                **self._counters,
+                "avg_batch_size": round(self._counters["messages"] / batches, 2) if batches else 0.0,
+                "queue_depth": self._queue.qsize(),
+                "batch_size_histogram": dict(self._batch_sizes),
+                "wait_ms_histogram": dict(self._wait_ms),
+            }
+
+
+# Process-wide batcher shared by every intake worker.
+assess_batcher = AssessmentBatcher()
@@ -0,0 +1,97 @@
+import asyncio
+import time
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from .async_database import get_async_db
+from .api import ChatRequest, ChatResponse
+from .memory_engine import AsyncMemoryKeepEngine, fetch_domain_profile_async, fetch_past_snippets_async
+from .gemma_client import generate_reply_async, analyze_turn_async, FUSED_TURN_ANALYSIS
+from .llm_scheduler import LLMUnavailableError
+from .turn_pipeline import record_timings
+
+# Async request path (ASYNC_API=1): same routes as api.py, but no threadpool worker is held
+# across the Gemma round trip, so one process can keep hundreds of chats in flight.
+router = APIRouter()
+
+
+async def _timed(timings: dict, name: str, awaitable):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _finish_turn(engine: AsyncMemoryKeepEngine, reply: str):
+    await engine.intake_valve("assistant", reply)
+    await engine.commit_turn()
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(request: ChatRequest, db: AsyncSession = Depends(get_async_db)):
+    started = time.perf_counter()
+    timings = {}
+
+    # 1. Initialize Engine (one unit of work: the turn's writes land in a single commit)
+    engine = AsyncMemoryKeepEngine(db, request.user_id)
+
+    # 2. Intake, domain and retrieval side by side (domain / retrieval on their own sessions)
+    async def intake_and_retrieval():
+        if FUSED_TURN_ANALYSIS:
+            # The analysis gates intake and retrieval only; domain runs alongside it
+            analysis = await _timed(timings, "analysis", analyze_turn_async(request.message, user_id=request.user_id))
+            intake = engine.intake_valve("user", request.message, assessment=analysis)
+            retrieval = fetch_past_snippets_async(
+                request.user_id, request.message, decision=analysis, deep=request.deep_search
+            )
+        else:
+            intake = engine.intake_valve("user", request.message)
+            retrieval = fetch_past_snippets_async(request.user_id, request.message, deep=request.deep_search)
+        _, snippets = await asyncio.gather(
+            _timed(timings, "intake", intake),
+            _timed(timings, "retrieval", retrieval),
+        )
+        return snippets
+
+    profile, past_snippets = await asyncio.gather(
+        _timed(timings, "domain", fetch_domain_profile_async(request.user_id)),
+        intake_and_retrieval(),
+    )
+
+    # 3. Load Context (Core + Directives + Domain + Experience + Stream)
+    context = await _timed(timings, "context", engine.load_context(
+        user_message=request.message, profile=profile, past_snippets=past_snippets
+    ))
+
+    # 4. Generate Reply via Gemma 3 27B
+    try:
+        reply, model = await _timed(timings, "generate", generate_reply_async(context, user_id=request.user_id))
+    except LLMUnavailableError as e:
+        # Nothing of the turn is kept; the client may retry the same message
+        await engine.rollback_turn()
+        raise HTTPException(status_code=503, detail=f"Lux is temporarily unavailable: {e}")
+
+    # 5. Intake AI Reply + commit the turn
+    await _timed(timings, "reply_intake", _finish_turn(engine, reply))
+
+    # 6. Get token stats for frontend
+    stats = await _timed(timings, "stats", engine.get_token_stats())
+
+    timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+    record_timings(timings)
+
+    return {
+        "reply": reply,
+        "token_count": stats["stream_tokens"],
+        "authority_tokens": stats["authority_tokens"],
+        "sifter_tokens": stats["sifter_tokens"],
+        "capacity_pct": stats["capacity_pct"],
+        "timings": timings,
+        "model": model
+    }
+
+
+@router.get("/tokens/{user_id}")
+async def get_token_stats(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    """Returns current token stats for a user. Sidecar tokens excluded from reboot."""
+    return await AsyncMemoryKeepEngine(db, user_id).get_token_stats()
@@ -0,0 +1,59 @@
+# Lux Async Database Config — same target as database.py, async drivers
+import threading
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from .database import SQLALCHEMY_DATABASE_URL, DB_PROFILE, ENGINE_PROFILES, IS_SQLITE, install_sqlite_pragmas
+
+# Sync driver -> async driver for the same database
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+asyncmy",
+    "mysql+pymysql": "mysql+asyncmy",
+}
+
+_async_engine = None
+_async_sessionmaker = None
+_init_lock = threading.Lock()
+
+
+def to_async_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def get_async_engine():
+    """
+    Builds the async engine on first use, so deployments that never enable the async API
+    do not need aiosqlite / asyncmy installed.
+    """
+    global _async_engine, _async_sessionmaker
+    if _async_engine is None:
+        with _init_lock:
+            if _async_engine is None:
+                # Same profile as the sync engine, minus the sync-only pool class
+                options = ENGINE_PROFILES[DB_PROFILE]()
+                options.pop("poolclass", None)
+                if IS_SQLITE:
+                    options.pop("connect_args", None)
+                _async_engine = create_async_engine(to_async_url(SQLALCHEMY_DATABASE_URL), **options)
+                if IS_SQLITE:
+                    install_sqlite_pragmas(_async_engine.sync_engine)
+                _async_sessionmaker = async_sessionmaker(_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+
+def AsyncSessionLocal():
+    """Async counterpart of SessionLocal()."""
+    get_async_engine()
+    return _async_sessionmaker()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    if _async_engine is not None:
+        await _async_engine.dispose()
@@ -1,5 +1,8 @@
 # Lux Database Config v1.2 - Vercel & IP Verified
-from sqlalchemy import create_engine
+import time
+from collections import deque
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -43,11 +46,113 @@ else:
 if not SQLALCHEMY_DATABASE_URL or len(SQLALCHEMY_DATABASE_URL) < 5:
     SQLALCHEMY_DATABASE_URL = DEFAULT_DB_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    # Only use check_same_thread for SQLite
-    connect_args={"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
-)
+# --- Engine Profiles ---
+# mysql_pooled : long-lived server talking to Hostinger MySQL (pre-ping + recycle under its idle timeout)
+# sqlite_local : local file DB tuned with WAL / synchronous=NORMAL / mmap and a statement cache
+# serverless   : Vercel; a tiny pool on the module-level engine, reused across warm invocations
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "280"))  # Seconds; below MySQL's wait_timeout
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+WAIT_WINDOW = 500  # Recent pool wait samples kept for stats
+
+IS_SQLITE = SQLALCHEMY_DATABASE_URL.startswith("sqlite")
+IS_MEMORY_SQLITE = IS_SQLITE and (":memory:" in SQLALCHEMY_DATABASE_URL or SQLALCHEMY_DATABASE_URL.rstrip("/").endswith(":"))
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection."""
+
+    waits = deque(maxlen=WAIT_WINDOW)
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.waits.append(time.perf_counter() - started)
+
+
+def _select_profile():
+    explicit = os.getenv("DB_PROFILE", "").strip().lower()
+    if explicit in ENGINE_PROFILES:
+        return explicit
+    if IS_VERCEL:
+        return "serverless"
+    return "sqlite_local" if IS_SQLITE else "mysql_pooled"
+
+
+def _mysql_pooled():
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": 30,
+        "pool_pre_ping": True,
+        "pool_recycle": POOL_RECYCLE,
+    }
+
+
+def _sqlite_local():
+    if IS_MEMORY_SQLITE:
+        # In-memory DBs live per connection; keep SQLAlchemy's default singleton pool.
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": 5,
+        "max_overflow": 10,
+        "connect_args": {"check_same_thread": False, "cached_statements": 256},
+    }
+
+
+def _serverless():
+    if IS_MEMORY_SQLITE:
+        return _sqlite_local()
+    if IS_SQLITE:
+        return {
+            "poolclass": TimedQueuePool,
+            "pool_size": 1,
+            "max_overflow": 4,
+            "connect_args": {"check_same_thread": False, "cached_statements": 128},
+        }
+    # Frozen containers silently lose sockets: always ping, recycle aggressively.
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": 1,
+        "max_overflow": 2,
+        "pool_timeout": 10,
+        "pool_pre_ping": True,
+        "pool_recycle": 60,
+    }
+
+
+ENGINE_PROFILES = {
+    "mysql_pooled": _mysql_pooled,
+    "sqlite_local": _sqlite_local,
+    "serverless": _serverless,
+}
+
+DB_PROFILE = _select_profile()
+
+
+def install_sqlite_pragmas(target_engine):
+    """Per-connection SQLite tuning (also used for the async engine's sync core)."""
+
+    @event.listens_for(target_engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **ENGINE_PROFILES[DB_PROFILE]())
+if IS_SQLITE:
+    install_sqlite_pragmas(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -58,3 +163,21 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_pool_stats():
+    """Connection pool health for the active profile (wait times in ms)."""
+    pool = engine.pool
+    waits = sorted(TimedQueuePool.waits)
+
+    def pick(q):
+        return round(waits[min(len(waits) - 1, int(q * len(waits)))] * 1000, 2) if waits else 0.0
+
+    return {
+        "profile": DB_PROFILE,
+        "dialect": engine.dialect.name,
+        "size": pool.size() if hasattr(pool, "size") else None,
+        "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+        "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+        "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+        "wait_ms": {"p50": pick(0.50), "p95": pick(0.95), "max": round(waits[-1] * 1000, 2) if waits else 0.0},
+    }
@@ -1,6 +1,98 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models import DomainMemory
 
+UPSERT_CHUNK_SIZE = 500  # Rows per INSERT statement (keeps bound parameters well under driver limits)
+
+# Configuration — Domain Profile Cache
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "4096"))  # Rendered profiles kept in memory
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))    # Seconds; bounds staleness across processes
+
+
+class ProfileCache:
+    """
+    LRU of rendered [USER DOMAIN DATA] blocks keyed by (user_id, version).
+    Writers bump the user's version, so a render that raced a write is stored
+    under a version nobody asks for any more and simply ages out.
+    """
+
+    def __init__(self, size: int = PROFILE_CACHE_SIZE, ttl: float = PROFILE_CACHE_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def version(self, user_id: int):
+        with self._lock:
+            return self._versions.get(user_id, 0)
+
+    def get(self, user_id: int, version: int):
+        key = (user_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self._counters["hits"] += 1
+                return entry[0]
+            self._entries.pop(key, None)
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, user_id: int, version: int, profile: str):
+        with self._lock:
+            if self._versions.get(user_id, 0) != version:
+                return  # A write landed while this profile was being rendered
+            self._entries[(user_id, version)] = (profile, time.monotonic())
+            self._entries.move_to_end((user_id, version))
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            version = self._versions.get(user_id, 0)
+            self._entries.pop((user_id, version), None)
+            self._versions[user_id] = version + 1
+            self._counters["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._counters, "size": len(self._entries)}
+
+
+# Process-wide cache shared by every DomainEngine.
+profile_cache = ProfileCache()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_profiles(session):
+    # Writers with commit=False mark the session; the commit that publishes them invalidates again.
+    for user_id in session.info.pop("dirty_profiles", ()):
+        profile_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty_profiles(session):
+    session.info.pop("dirty_profiles", None)
+
+
+def render_profile(facts):
+    """Builds the [USER DOMAIN DATA] block from (key, value) pairs in a single join."""
+    if not facts:
+        return ""
+    return "\n[USER DOMAIN DATA]:\n" + "".join(f"- {key}: {value}\n" for key, value in facts)
+
+
 class DomainEngine:
     def __init__(self, db: Session, user_id: int):
         self.db = db
@@ -8,32 +100,93 @@ class DomainEngine:
 
     def get_user_profile(self):
         """
-        Retrieves structured domain facts about the user.
+        Retrieves structured domain facts about the user (cached until the next write).
         """
-        memories = self.db.query(DomainMemory).filter(
+        version = profile_cache.version(self.user_id)
+        profile = profile_cache.get(self.user_id, version)
+        if profile is not None:
+            return profile
+
+        facts = self.db.query(DomainMemory.key, DomainMemory.value).filter(
             DomainMemory.user_id == self.user_id
         ).all()
-        
-        if not memories:
-            return ""
-            
-        profile = "\n[USER DOMAIN DATA]:\n"
-        for mem in memories:
-            profile += f"- {mem.key}: {mem.value}\n"
+        profile = render_profile(facts)
+        profile_cache.put(self.user_id, version, profile)
         return profile
 
     def update_fact(self, key: str, value: str):
         """
         Updates or creates a structured domain fact.
         """
-        existing = self.db.query(DomainMemory).filter(
-            DomainMemory.user_id == self.user_id,
-            DomainMemory.key == key
-        ).first()
-        
-        if existing:
-            existing.value = value
-        else:
-            new_fact = DomainMemory(user_id=self.user_id, key=key, value=value)
-            self.db.add(new_fact)
-        self.db.commit()
+        self.upsert_facts({key: value})
+
+    def upsert_facts(self, facts: dict, commit: bool = True):
+        """
+        Bulk upsert of structured domain facts: one native INSERT ... ON CONFLICT /
+        ON DUPLICATE KEY UPDATE per chunk, all inside a single transaction.
+        Relies on the unique (user_id, key) index. Returns the number of facts written.
+        """
+        if not facts:
+            return 0
+
+        now = datetime.utcnow()
+        rows = [
+            {"user_id": self.user_id, "key": str(key), "value": None if value is None else str(value), "created_at": now}
+            for key, value in facts.items()
+        ]
+        dialect = self.db.get_bind().dialect.name
+
+        for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[start:start + UPSERT_CHUNK_SIZE]
+            if dialect in ("sqlite", "postgresql"):
+                insert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+                stmt = insert(DomainMemory).values(chunk)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["user_id", "key"], set_={"value": stmt.excluded.value}
+                )
+                self.db.execute(stmt)
+            elif dialect == "mysql":
+                stmt = mysql_insert(DomainMemory).values(chunk)
+                stmt = stmt.on_duplicate_key_update(value=stmt.inserted.value)
+                self.db.execute(stmt)
+            else:
+                self._upsert_rows_portable(chunk)
+
+        # Drop the cached profile now, and again once the write is visible to other sessions
+        profile_cache.invalidate(self.user_id)
+        self.db.info.setdefault("dirty_profiles", set()).add(self.user_id)
+        if commit:
+            self.db.commit()
+        return len(rows)
+
+    def _upsert_rows_portable(self, rows):
+        """Fallback for dialects without a native upsert: one read for the chunk, then writes."""
+        existing = {
+            mem.key: mem for mem in self.db.query(DomainMemory).filter(
+                DomainMemory.user_id == self.user_id,
+                DomainMemory.key.in_([row["key"] for row in rows])
+            )
+        }
+        for row in rows:
+            if row["key"] in existing:
+                existing[row["key"]].value = row["value"]
+            else:
+                self.db.add(DomainMemory(**row))
+        self.db.flush()
+
+
+class AsyncDomainEngine:
+    """Awaitable DomainEngine; the ORM work is shared with the sync engine via run_sync."""
+
+    def __init__(self, db: AsyncSession, user_id: int):
+        self.db = db
+        self.user_id = user_id
+
+    async def get_user_profile(self):
+        return await self.db.run_sync(lambda s: DomainEngine(s, self.user_id).get_user_profile())
+
+    async def update_fact(self, key: str, value: str):
+        return await self.db.run_sync(lambda s: DomainEngine(s, self.user_id).update_fact(key, value))
+
+    async def upsert_facts(self, facts: dict, commit: bool = True):
+        return await self.db.run_sync(lambda s: DomainEngine(s, self.user_id).upsert_facts(facts, commit=commit))
@@ -0,0 +1,78 @@
+"""
+HTTP stand-in for the model API, backed by FakeProvider (same latency / error / canned-JSON settings).
+Run from backend/:  python -m app.fake_llm_server --port 8900
+then point the app at it with LLM_PROVIDER=http LLM_HTTP_URL=http://127.0.0.1:8900
+"""
+import argparse
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .llm_providers import FakeProvider, ProviderError
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    provider = None  # Set by serve()
+
+    def _reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = request.get("model", "")
+        chat_args = (model, request.get("system"), request.get("history", []), request.get("message", ""))
+        try:
+            if self.path == "/v1/generate":
+                self._reply(200, {"text": self.provider.generate(*chat_args)})
+            elif self.path == "/v1/json":
+                self._reply(200, {"text": self.provider.generate_json(model, request.get("prompt", ""))})
+            elif self.path == "/v1/count_tokens":
+                self._reply(200, {"tokens": self.provider.count_tokens(model, request.get("text", ""))})
+            elif self.path == "/v1/stream":
+                self._stream(chat_args)
+            else:
+                self._reply(404, {"error": f"unknown path {self.path}"})
+        except ProviderError as e:
+            self._reply(503, {"error": str(e)})
+
+    def _stream(self, chat_args):
+        """Newline-delimited JSON chunks; a failure before the first chunk is still a plain 503."""
+        chunks = self.provider.stream(*chat_args)
+        first = next(chunks, None)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for text in ([first] if first is not None else []):
+                self.wfile.write((json.dumps({"text": text}) + "\n").encode("utf-8"))
+            for text in chunks:
+                self.wfile.write((json.dumps({"text": text}) + "\n").encode("utf-8"))
+                self.wfile.flush()
+        except ProviderError as e:
+            self.wfile.write((json.dumps({"error": str(e)}) + "\n").encode("utf-8"))
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass  # One line per call would drown a load test
+
+
+def serve(host="127.0.0.1", port=8900, provider=None):
+    FakeLLMHandler.provider = provider or FakeProvider()
+    server = ThreadingHTTPServer((host, port), FakeLLMHandler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake model server for offline load tests and benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+    server = serve(args.host, args.port)
+    print(f"Fake LLM server on http://{args.host}:{args.port} ({FakeLLMHandler.provider.latency}, "
+          f"error rate {FakeLLMHandler.provider.error_rate})")
+    server.serve_forever()
@@ -1,61 +1,229 @@
+import asyncio
 import os
 import json
-import google.generativeai as genai
+import time
+from .model_router import ModelRouter
+from .llm_providers import create_provider, estimate_tokens, LLM_PROVIDER, EXACT_TOKEN_COUNT
+from .llm_scheduler import (
+    llm_scheduler, LLMUnavailableError,
+    PRIORITY_CHAT, PRIORITY_RETRIEVAL, PRIORITY_ASSESS, PRIORITY_SIFT,
+)
 
 # --- API Configuration ---
-API_KEY = os.getenv("GEMINI_API_KEY", "")
 # Main brain (Lux): Qualified authority for autonomous context-aware decisions.
 CHAT_MODEL = "gemma-3-27b-it"      
 # Passive sifter: Background observer for pattern recognition.
 SIFTER_MODEL = "gemma-3-4b-it"     
+# One structured call per user message for importance + retrieval (falls back to split calls).
+FUSED_TURN_ANALYSIS = os.getenv("FUSED_TURN_ANALYSIS", "0").strip().lower() in ("1", "true", "yes")
 
-if API_KEY:
-    genai.configure(api_key=API_KEY)
+# Model backend: the Google SDK, or the offline fake / HTTP stand-in (LLM_PROVIDER, see llm_providers).
+llm_provider = create_provider(LLM_PROVIDER)
 
-def generate_response(prompt_context):
-    """
-    Generates a response from Gemma 3 27B via the Google Generative AI SDK.
-    Lux acts as the autonomous authority here.
-    """
-    if not API_KEY:
-        return "[System Error: GEMINI_API_KEY not found in environment variables.]"
+# Process-wide router: which model each lane gets, from the 27B's rolling latency / error rate.
+model_router = ModelRouter(CHAT_MODEL, SIFTER_MODEL)
+
+def warm_up_models():
+    """Builds the instruction-free clients at startup so the first requests skip construction."""
+    llm_provider.warm_up((CHAT_MODEL, SIFTER_MODEL))
+
+def model_pool_stats():
+    return llm_provider.stats()
+
+def _unavailable():
+    if LLM_PROVIDER == "google":
+        return LLMUnavailableError("GEMINI_API_KEY not found in environment variables.")
+    return LLMUnavailableError(f"LLM provider '{LLM_PROVIDER}' is not available.")
 
+def _parse_json_object(raw_response):
+    """Returns the outermost {...} object in a model reply, or None if there is none / it is invalid."""
+    start = raw_response.find('{')
+    end = raw_response.rfind('}') + 1
+    if start == -1 or end == 0:
+        return None
     try:
-        system_instruction = ""
-        gemini_history = []
-        
-        for msg in prompt_context:
-            if msg['role'] == 'system':
-                system_instruction += msg['content'] + "\n"
-            else:
-                role = 'user' if msg['role'] == 'user' else 'model'
-                gemini_history.append({'role': role, 'parts': [msg['content']]})
-        
-        model = genai.GenerativeModel(
-            CHAT_MODEL,
-            system_instruction=system_instruction if system_instruction else None
-        )
-        
-        if not gemini_history:
-            return ""
-            
-        last_message = gemini_history.pop()
-        chat = model.start_chat(history=gemini_history)
-        response = chat.send_message(last_message['parts'][0])
+        parsed = json.loads(raw_response[start:end])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def _parse_json_array(raw_response):
+    """Returns the outermost [...] array in a model reply, or None if there is none / it is invalid."""
+    start = raw_response.find('[')
+    end = raw_response.rfind(']') + 1
+    if start == -1 or end == 0:
+        return None
+    try:
+        parsed = json.loads(raw_response[start:end])
+    except ValueError:
+        return None
+    return parsed if isinstance(parsed, list) else None
+
+def _prepare_chat(prompt_context):
+    """Splits the prompt payload into a system instruction, chat history and the message to send."""
+    system_parts = []
+    history = []
+    
+    for msg in prompt_context:
+        if msg['role'] == 'system':
+            system_parts.append(msg['content'])
+        else:
+            role = 'user' if msg['role'] == 'user' else 'model'
+            history.append({'role': role, 'content': msg['content']})
+    
+    system_instruction = "\n".join(system_parts) + "\n" if system_parts else None
+    
+    if not history:
+        return system_instruction, [], None
         
-        return response.text
-    except Exception as e:
-        print(f"Gemini API Error: {e}")
-        return f"[Cloud API Error: {e}]"
+    last_message = history.pop()
+    return system_instruction, history, last_message['content']
+
+def _context_tokens(model_name, prompt_context):
+    return sum(llm_provider.count_tokens(model_name, msg['content']) for msg in prompt_context)
+
+async def _count_off_loop(count, *args):
+    """EXACT_TOKEN_COUNT makes counting a round trip: keep it off the event loop."""
+    return await asyncio.to_thread(count, *args) if EXACT_TOKEN_COUNT else count(*args)
+
+def _observed(model_name, fn):
+    """Wraps one SDK call so its latency and outcome feed the model router."""
+    def call():
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception:
+            model_router.observe(model_name, time.perf_counter() - started, False)
+            raise
+        model_router.observe(model_name, time.perf_counter() - started, True)
+        return result
+    return call
+
+def _observed_async(model_name, fn):
+    async def call():
+        started = time.perf_counter()
+        try:
+            result = await fn()
+        except Exception:
+            model_router.observe(model_name, time.perf_counter() - started, False)
+            raise
+        model_router.observe(model_name, time.perf_counter() - started, True)
+        return result
+    return call
+
+def generate_reply(prompt_context, priority=PRIORITY_CHAT, user_id=None):
+    """
+    Generates a response via the LLM provider: Gemma 3 27B (Lux) while it is healthy,
+    Gemma 3 4B when the router degrades this lane or the 27B call fails outright.
+    Scheduled (priority lane, rate limits, retries). Returns (text, model used);
+    raises LLMUnavailableError when no model can reply.
+    """
+    if not llm_provider.available:
+        raise _unavailable()
+
+    model_name = model_router.route(priority)
+    while True:
+        system_instruction, history, last_message = _prepare_chat(prompt_context)
+        if last_message is None:
+            return "", model_name
+
+        def send():
+            return llm_provider.generate(model_name, system_instruction, history, last_message)
+
+        try:
+            text = llm_scheduler.call(model_name, _observed(model_name, send), priority=priority,
+                                      user_id=user_id, tokens=_context_tokens(model_name, prompt_context))
+            return text, model_name
+        except LLMUnavailableError:
+            if model_name == SIFTER_MODEL:
+                raise
+            print(f"Falling back to {SIFTER_MODEL} after {model_name} failed")
+            model_name = SIFTER_MODEL
+
+def generate_response(prompt_context, priority=PRIORITY_CHAT, user_id=None):
+    """generate_reply() without the model name."""
+    return generate_reply(prompt_context, priority=priority, user_id=user_id)[0]
+
+async def generate_reply_async(prompt_context, priority=PRIORITY_CHAT, user_id=None):
+    """Awaitable generate_reply for the async API."""
+    if not llm_provider.available:
+        raise _unavailable()
+
+    model_name = model_router.route(priority)
+    while True:
+        system_instruction, history, last_message = _prepare_chat(prompt_context)
+        if last_message is None:
+            return "", model_name
+
+        def send():
+            return llm_provider.generate_async(model_name, system_instruction, history, last_message)
+
+        try:
+            tokens = await _count_off_loop(_context_tokens, model_name, prompt_context)
+            text = await llm_scheduler.call_async(model_name, _observed_async(model_name, send), priority=priority,
+                                                  user_id=user_id, tokens=tokens)
+            return text, model_name
+        except LLMUnavailableError:
+            if model_name == SIFTER_MODEL:
+                raise
+            print(f"Falling back to {SIFTER_MODEL} after {model_name} failed")
+            model_name = SIFTER_MODEL
+
+async def generate_response_async(prompt_context, priority=PRIORITY_CHAT, user_id=None):
+    return (await generate_reply_async(prompt_context, priority=priority, user_id=user_id))[0]
+
+def stream_response(prompt_context, user_id=None, model_name=CHAT_MODEL):
+    """
+    Streaming variant of generate_response: yields reply text chunks as Gemma produces them.
+    Errors are raised to the caller, which decides how to surface them mid-stream.
+    The caller picks `model_name` (model_router.route) up front, so it can report it.
+    """
+    if not llm_provider.available:
+        raise _unavailable()
+
+    system_instruction, history, last_message = _prepare_chat(prompt_context)
+    if last_message is None:
+        return
+
+    def chunks():
+        started = time.perf_counter()
+        try:
+            yield from llm_provider.stream(model_name, system_instruction, history, last_message)
+        except Exception:
+            model_router.observe(model_name, time.perf_counter() - started, False)
+            raise
+        model_router.observe(model_name, time.perf_counter() - started, True)
+
+    yield from llm_scheduler.stream(model_name, chunks, user_id=user_id,
+                                    tokens=_context_tokens(model_name, prompt_context))
+
+def stream_reply(prompt_context, user_id=None):
+    """
+    Streaming generate_reply: yields (chunk, model used) pairs, falling back to Gemma 3 4B when the
+    27B fails — but only before the first chunk; once text is out, a failure goes to the caller.
+    """
+    model_name = model_router.route(PRIORITY_CHAT)
+    while True:
+        started = False
+        try:
+            for text in stream_response(prompt_context, user_id=user_id, model_name=model_name):
+                started = True
+                yield text, model_name
+            return
+        except LLMUnavailableError:
+            if started or model_name == SIFTER_MODEL:
+                raise
+            print(f"Falling back to {SIFTER_MODEL} after {model_name} failed")
+            model_name = SIFTER_MODEL
 
-def sift_and_summarize(content):
+def sift_and_summarize(content, user_id=None):
     """
     The Sifter: Gemma 3 4B (Passive Observer).
     Only identifies patterns during reboots (context flushes).
     NO authority to decision database writes or domain updates.
     """
-    if not API_KEY:
-        return {"summary": "No API key.", "patterns": [], "sidecar_tokens": 0}
+    if not llm_provider.available:
+        return {"summary": "No API key.", "patterns": [], "sidecar_tokens": 0, "error": "no provider"}
 
     prompt = f"""
     [ROLE: SIDECAR OBSERVER]
@@ -77,31 +245,30 @@ def sift_and_summarize(content):
     }}
     """
     try:
-        model = genai.GenerativeModel(SIFTER_MODEL)
-        response = model.generate_content(prompt)
-        raw_response = response.text
+        raw_response = llm_scheduler.call(SIFTER_MODEL, _observed(SIFTER_MODEL, lambda: llm_provider.generate_json(SIFTER_MODEL, prompt)),
+                                          priority=PRIORITY_SIFT, user_id=user_id,
+                                          tokens=llm_provider.count_tokens(SIFTER_MODEL, prompt))
         
         # Estimate sidecar tokens (input + output)
         sidecar_tokens = int((len(prompt.split()) + len(raw_response.split())) * 1.3)
         
         # Parse JSON from response
-        start = raw_response.find('{')
-        end = raw_response.rfind('}') + 1
-        if start != -1 and end != 0:
-            result = json.loads(raw_response[start:end])
+        result = _parse_json_object(raw_response)
+        if result is not None:
             result["sidecar_tokens"] = sidecar_tokens
             return result
     except Exception as e:
         print(f"Sift Error (4B): {e}")
     
-    return {"summary": "Conversation consolidated.", "patterns": [], "sidecar_tokens": 0}
+    # "error" marks the placeholder, so callers never store it in place of a real summary
+    return {"summary": "Conversation consolidated.", "patterns": [], "sidecar_tokens": 0, "error": "sift failed"}
 
-def assess_importance(role, content):
+def assess_importance(role, content, user_id=None):
     """
     Intake Authority (Lux 27B).
     Lux possesses the context and makes autonomous decisions on what to keep.
     """
-    if not API_KEY:
+    if not llm_provider.available:
         return {"important": False, "category": "", "fact": "", "tokens": 0}
 
     prompt = f"""
@@ -120,20 +287,143 @@ def assess_importance(role, content):
     }}
     """
     try:
-        # 27B is the only qualified authority for this role.
-        model = genai.GenerativeModel(CHAT_MODEL)
-        response = model.generate_content(prompt)
-        raw_response = response.text
+        # 27B is the only qualified authority for this role (4B stands in while the router degrades it).
+        model_name = model_router.route(PRIORITY_ASSESS)
+        raw_response = llm_scheduler.call(model_name, _observed(model_name, lambda: llm_provider.generate_json(model_name, prompt)),
+                                          priority=PRIORITY_ASSESS, user_id=user_id,
+                                          tokens=llm_provider.count_tokens(model_name, prompt))
         
         tokens = int((len(prompt.split()) + len(raw_response.split())) * 1.3)
         
-        start = raw_response.find('{')
-        end = raw_response.rfind('}') + 1
-        if start != -1 and end != 0:
-            result = json.loads(raw_response[start:end])
+        result = _parse_json_object(raw_response)
+        if result is not None:
             result["tokens"] = tokens
             return result
     except Exception as e:
         print(f"Intake Assessment Error (27B): {e}")
+        return {"important": False, "category": "", "fact": "", "tokens": 0, "error": str(e)}
     
     return {"important": False, "category": "", "fact": "", "tokens": 0}
+
+def assess_importance_batch(messages, user_id=None):
+    """
+    Intake Authority (Lux 27B) over several (role, content) messages in one prompt.
+    Returns one verdict per message, in order; a message the reply leaves out comes back as None.
+    `user_id` is whose fairness slot the (possibly multi-user) call takes in the scheduler.
+    """
+    if not llm_provider.available:
+        return [{"important": False, "category": "", "fact": "", "tokens": 0} for _ in messages]
+
+    numbered = "\n".join(
+        f"    [{i}] ({role}) {json.dumps(content, ensure_ascii=False)}" for i, (role, content) in enumerate(messages)
+    )
+    prompt = f"""
+    [ROLE: INTAKE AUTHORITY (LUX)]
+    You are the primary cognitive authority. Analyze each numbered message below on its own.
+    Does it contain a fact, preference, or unique truth worth saving to long-term memory?
+    
+    Messages:
+{numbered}
+    
+    Output a JSON array with exactly one object per message:
+    [
+      {{
+        "index": 0,
+        "important": true/false,
+        "category": "preference" | "fact" | "pattern" | "",
+        "fact": "concise synthesized fact if important, else empty",
+        "reason": "why this matters to Lux"
+      }}
+    ]
+    """
+    try:
+        model_name = model_router.route(PRIORITY_ASSESS)
+        raw_response = llm_scheduler.call(model_name, _observed(model_name, lambda: llm_provider.generate_json(model_name, prompt)),
+                                          priority=PRIORITY_ASSESS, user_id=user_id,
+                                          tokens=llm_provider.count_tokens(model_name, prompt))
+
+        # The batch cost is shared evenly by its messages
+        tokens = int((len(prompt.split()) + len(raw_response.split())) * 1.3) // len(messages)
+
+        verdicts = [None] * len(messages)
+        for item in _parse_json_array(raw_response) or []:
+            index = item.get("index") if isinstance(item, dict) else None
+            if isinstance(index, int) and 0 <= index < len(messages) and verdicts[index] is None:
+                verdicts[index] = {**item, "tokens": tokens}
+        return verdicts
+    except Exception as e:
+        print(f"Intake Batch Assessment Error (27B): {e}")
+        return [{"important": False, "category": "", "fact": "", "tokens": 0, "error": str(e)} for _ in messages]
+
+def _turn_analysis_prompt(content):
+    return f"""
+    [ROLE: TURN ANALYSIS (LUX)]
+    You are the primary cognitive authority. Analyze this user message and make two decisions at once.
+    1. Intake: does it contain a fact, preference, or unique truth worth saving to long-term memory?
+    2. Retrieval: do you need to search your Experience Memory to respond accurately or maintain continuity?
+    
+    Message: "{content}"
+    
+    Output ONLY this JSON object:
+    {{
+      "important": true/false,
+      "category": "preference" | "fact" | "pattern" | "",
+      "fact": "concise synthesized fact if important, else empty",
+      "needs_search": true/false,
+      "search_query": "standalone query string if needed, else empty"
+    }}
+    """
+
+def _parse_turn_analysis(prompt, raw_response):
+    result = _parse_json_object(raw_response)
+    if result is None or not isinstance(result.get("important"), bool) or not isinstance(result.get("needs_search"), bool):
+        print("Turn Analysis Error (27B): unparseable decision, falling back to split calls")
+        return None
+
+    result.setdefault("category", "")
+    result.setdefault("fact", "")
+    result.setdefault("search_query", "")
+    if result["important"] and not result["fact"]:
+        result["important"] = False
+    result["tokens"] = int((len(prompt.split()) + len(raw_response.split())) * 1.3)
+    return result
+
+def analyze_turn(content, user_id=None):
+    """
+    Fused Turn Analysis (Lux 27B).
+    One round trip answers both intake ("is this worth keeping?") and retrieval ("do I need my history?").
+    Returns None when the reply cannot be trusted, so callers fall back to the split calls.
+    """
+    if not llm_provider.available:
+        return None
+
+    prompt = _turn_analysis_prompt(content)
+    try:
+        model_name = model_router.route(PRIORITY_RETRIEVAL)
+        raw_response = llm_scheduler.call(model_name, _observed(model_name, lambda: llm_provider.generate_json(model_name, prompt)),
+                                          priority=PRIORITY_RETRIEVAL, user_id=user_id,
+                                          tokens=llm_provider.count_tokens(model_name, prompt))
+        return _parse_turn_analysis(prompt, raw_response)
+    except Exception as e:
+        print(f"Turn Analysis Error (27B): {e}")
+    
+    return None
+
+async def analyze_turn_async(content, user_id=None):
+    """Awaitable analyze_turn for the async API."""
+    if not llm_provider.available:
+        return None
+
+    prompt = _turn_analysis_prompt(content)
+    try:
+        model_name = model_router.route(PRIORITY_RETRIEVAL)
+        raw_response = await llm_scheduler.call_async(
+            model_name, _observed_async(model_name, lambda: llm_provider.generate_json_async(model_name, prompt)),
+            priority=PRIORITY_RETRIEVAL, user_id=user_id,
+            tokens=await _count_off_loop(llm_provider.count_tokens, model_name, prompt)
+        )
+        return _parse_turn_analysis(prompt, raw_response)
+    except Exception as e:
+        print(f"Turn Analysis Error (27B): {e}")
+
+    return None
@@ -0,0 +1,125 @@
+import hashlib
+import math
+import threading
+from collections import Counter, OrderedDict
+from .retrieval_gate import normalize, TRIVIAL_WORDS, STOPWORDS
+
+# Configuration — Intake pre-filter (in front of the 27B importance call)
+VERDICT_CACHE_SIZE = 8192   # Normalized messages whose 27B verdict is remembered
+MIN_ENTROPY = 2.0           # Bits per character; "hahahaha" / "hmmmm" sit well below
+MAX_FILLER_CHARS = 3        # ... and are spelled with this few distinct characters (no digits)
+SHORT_MESSAGE_WORDS = 8     # The classifier only judges messages up to this long
+DEFAULT_ASSESS_TOKENS = 200 # Cost assumed for a skipped call before real calls are measured
+
+# Reactions that carry no fact on their own; a short message made only of these (and small talk)
+# is confidently not worth keeping. Anything else reaches the 27B, cue or no cue.
+REACTION_WORDS = {
+    "bro", "dude", "man", "omg", "wtf", "lmfao", "rofl", "xd", "damn", "true", "same", "fair",
+    "exactly", "right", "indeed", "interesting", "sweet", "agreed", "agree", "totally", "really",
+    "seriously", "wait", "what", "huh", "ooh", "ohh", "aww", "yay", "welp", "meh", "idk", "ikr",
+    "gotcha", "got", "it", "makes", "sense", "fine", "perfect", "amazing", "wonderful",
+    "that", "so", "too", "very", "much", "all", "good", "bad", "lol", "sorry", "see", "ya",
+}
+
+
+def char_entropy(text: str) -> float:
+    """Shannon entropy in bits per character of the non-space characters."""
+    chars = [c for c in text.lower() if not c.isspace()]
+    if not chars:
+        return 0.0
+    total = len(chars)
+    return -sum(n / total * math.log2(n / total) for n in Counter(chars).values())
+
+
+class ImportanceFilter:
+    """
+    Tiered intake check: local skip rules first, then a cache of earlier 27B verdicts,
+    and only then the 27B. Local tiers only ever answer "not important" — saving a fact
+    needs the 27B's synthesized text.
+    """
+
+    def __init__(self, cache_size: int = VERDICT_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            "skip_empty": 0, "skip_low_entropy": 0, "skip_trivial": 0, "skip_classifier": 0, "cache_hits": 0, "llm_calls": 0,
+        }
+        self._llm_tokens = 0
+        self._saved_tokens = 0
+
+    def assess(self, role: str, content: str, assess_fn, user_id=None):
+        """
+        Returns an assess_importance-shaped verdict; `assess_fn(role, content, user_id)` is the 27B call
+        (`user_id` keeps the scheduler's per-user fairness in the assess lane).
+        """
+        key = normalize(content)
+
+        # 1. Local skip rules
+        reason = self._skip_reason(content, key)
+        if reason is not None:
+            self._skipped(reason)
+            return {"important": False, "category": "", "fact": "", "tokens": 0, "skipped": reason}
+
+        # 2. Verdict cache (role-scoped: the prompt names the role)
+        digest = hashlib.blake2b(f"{role}\x00{key}".encode("utf-8"), digest_size=16).digest()
+        with self._lock:
+            if digest in self._cache:
+                self._cache.move_to_end(digest)
+                self._counters["cache_hits"] += 1
+                self._saved_tokens += self._average_tokens()
+                return {**self._cache[digest], "tokens": 0, "cached": True}
+
+        # 3. 27B
+        verdict = assess_fn(role, content, user_id)
+        with self._lock:
+            self._counters["llm_calls"] += 1
+            self._llm_tokens += verdict.get("tokens", 0)
+            if not verdict.get("error"):
+                self._cache[digest] = verdict
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return verdict
+
+    def _skip_reason(self, content: str, key: str):
+        """Only clearly trivial messages are answered locally; a missing cue is not a "no"."""
+        words = key.split()
+        if not words:
+            return "skip_empty"  # Emoji / punctuation only
+        if all(w in TRIVIAL_WORDS or w in STOPWORDS for w in words):
+            return "skip_trivial"
+        letters = [c for c in key if not c.isspace()]
+        if (char_entropy(key) < MIN_ENTROPY and not any(c.isdigit() for c in letters)
+                and len(set(letters)) <= MAX_FILLER_CHARS):
+            return "skip_low_entropy"  # "hahahaha", "hmmmm", "lolol"
+        if len(words) <= SHORT_MESSAGE_WORDS and all(
+            w in TRIVIAL_WORDS or w in STOPWORDS or w in REACTION_WORDS for w in words
+        ):
+            return "skip_classifier"  # "omg same", "that makes sense dude"
+        return None
+
+    def _average_tokens(self):
+        calls = self._counters["llm_calls"]
+        return self._llm_tokens / calls if calls and self._llm_tokens else DEFAULT_ASSESS_TOKENS
+
+    def _skipped(self, reason):
+        with self._lock:
+            self._counters[reason] += 1
+            self._saved_tokens += self._average_tokens()
+
+    def stats(self):
+        with self._lock:
+            skipped = sum(v for k, v in self._counters.items() if k.startswith("skip_"))
+            seen = skipped + self._counters["cache_hits"] + self._counters["llm_calls"]
+            return {
+                **self._counters,
+                "messages": seen,
+                "skip_rate": round((skipped + self._counters["cache_hits"]) / seen, 3) if seen else 0.0,
+                "authority_tokens_spent": self._llm_tokens,
+                "authority_tokens_saved": int(self._saved_tokens),
+                "cache_size": len(self._cache),
+            }
+
+
+# Process-wide filter shared by every intake job.
+importance_filter = ImportanceFilter()
@@ -0,0 +1,41 @@
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .models import JobLease
+
+# Database-backed leases: unlike a threading.Lock they hold across worker processes and
+# hosts, and unlike a plain row lock they expire if the holder dies mid-job.
+
+
+def acquire_lease(db: Session, name: str, ttl_seconds: float):
+    """
+    Takes the named lease if it is free or expired. Returns the owner token, or None when
+    someone else holds it. Commits on its own: the lease must be visible before the job runs.
+    """
+    owner = uuid.uuid4().hex
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+
+    # 1. Take over an expired lease (single conditional UPDATE — only one contender wins)
+    taken = db.query(JobLease).filter(
+        JobLease.name == name, JobLease.expires_at < now
+    ).update({JobLease.owner: owner, JobLease.expires_at: expires_at}, synchronize_session=False)
+    if taken:
+        db.commit()
+        return owner
+
+    # 2. Otherwise create it; the primary key rejects a concurrent holder
+    try:
+        db.add(JobLease(name=name, owner=owner, expires_at=expires_at))
+        db.commit()
+        return owner
+    except IntegrityError:
+        db.rollback()
+        return None
+
+
+def release_lease(db: Session, name: str, owner: str):
+    """Drops the lease if `owner` still holds it (an expired-and-retaken lease is left alone)."""
+    db.query(JobLease).filter(JobLease.name == name, JobLease.owner == owner).delete(synchronize_session=False)
+    db.commit()
@@ -0,0 +1,391 @@
+import abc
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import google.generativeai as genai
+except ImportError:  # Only the Google provider needs the SDK; fake / http run without it.
+    genai = None
+
+# Configuration — LLM provider
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "google").strip().lower()  # google | fake | http
+API_KEY = os.getenv("GEMINI_API_KEY", "")
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "64"))
+EXACT_TOKEN_COUNT = os.getenv("EXACT_TOKEN_COUNT", "0").strip().lower() in ("1", "true", "yes")  # count_tokens round trip per call
+LLM_HTTP_URL = os.getenv("LLM_HTTP_URL", "http://127.0.0.1:8900").rstrip("/")
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "120"))
+
+# Configuration — Fake provider (offline load tests / benchmarks)
+FAKE_LLM_LATENCY = os.getenv("FAKE_LLM_LATENCY", "lognormal:400,1200")  # fixed:MS | uniform:LO,HI | lognormal:P50,P95
+FAKE_LLM_SMALL_SPEEDUP = float(os.getenv("FAKE_LLM_SMALL_SPEEDUP", "3"))  # 4B answers this many times faster
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))       # Share of calls failing with a retryable 503
+FAKE_LLM_REPLY_WORDS = int(os.getenv("FAKE_LLM_REPLY_WORDS", "60"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+SMALL_MODEL_MARKERS = ("4b", "1b", "2b")
+
+
+def estimate_tokens(text):
+    """Rough token approximation (words * 1.3)."""
+    return int(len((text or "").split()) * 1.3)
+
+
+class ProviderError(Exception):
+    """A provider call failed; the message carries the status (e.g. '503 ...') so the scheduler can retry."""
+
+
+class LLMProvider(abc.ABC):
+    """
+    What gemma_client needs from a model backend. `history` is a list of
+    {"role": "user" | "model", "content": str}; `message` is the turn to answer.
+    A provider missing a call fails when it is built, not on its first request.
+    """
+    name = "base"
+
+    @property
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    def generate(self, model, system_instruction, history, message):
+        """Returns the reply text."""
+
+    @abc.abstractmethod
+    async def generate_async(self, model, system_instruction, history, message):
+        """Awaitable generate()."""
+
+    @abc.abstractmethod
+    def stream(self, model, system_instruction, history, message):
+        """Yields reply text chunks."""
+
+    @abc.abstractmethod
+    def generate_json(self, model, prompt):
+        """Single-prompt call whose reply should hold JSON; returns the raw text (callers parse leniently)."""
+
+    @abc.abstractmethod
+    async def generate_json_async(self, model, prompt):
+        """Awaitable generate_json()."""
+
+    def count_tokens(self, model, text):
+        return estimate_tokens(text)
+
+    def warm_up(self, models):
+        pass
+
+    def stats(self):
+        return {"provider": self.name}
+
+
+class GoogleProvider(LLMProvider):
+    """Gemma through the Google Generative AI SDK, with a bounded pool of GenerativeModel clients."""
+    name = "google"
+
+    def __init__(self, api_key=API_KEY, pool_size=MODEL_POOL_SIZE):
+        self.api_key = api_key
+        self.pool_size = pool_size
+        self._pool = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+        if self.available:
+            genai.configure(api_key=api_key)
+
+    @property
+    def available(self):
+        return bool(self.api_key) and genai is not None
+
+    def _model(self, model_name, system_instruction=None):
+        """
+        Returns a pooled GenerativeModel keyed by (model name, system-instruction hash).
+        Bounded LRU, so one-off instructions cannot grow the pool without limit.
+        """
+        instruction_key = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest() if system_instruction else None
+        key = (model_name, instruction_key)
+        with self._lock:
+            model = self._pool.get(key)
+            if model is not None:
+                self._pool.move_to_end(key)
+                self._stats["hits"] += 1
+                return model
+            self._stats["misses"] += 1
+
+        model = genai.GenerativeModel(model_name, system_instruction=system_instruction)
+        with self._lock:
+            self._pool[key] = model
+            self._pool.move_to_end(key)
+            while len(self._pool) > self.pool_size:
+                self._pool.popitem(last=False)
+                self._stats["evictions"] += 1
+        return model
+
+    def _chat(self, model_name, system_instruction, history):
+        gemini_history = [{"role": turn["role"], "parts": [turn["content"]]} for turn in history]
+        return self._model(model_name, system_instruction).start_chat(history=gemini_history)
+
+    def generate(self, model, system_instruction, history, message):
+        return self._chat(model, system_instruction, history).send_message(message).text
+
+    async def generate_async(self, model, system_instruction, history, message):
+        response = await self._chat(model, system_instruction, history).send_message_async(message)
+        return response.text
+
+    def stream(self, model, system_instruction, history, message):
+        for chunk in self._chat(model, system_instruction, history).send_message(message, stream=True):
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+    def generate_json(self, model, prompt):
+        # Gemma on the Gemini API has no JSON mode (response_mime_type), so the prompt asks for it.
+        return self._model(model).generate_content(prompt).text
+
+    async def generate_json_async(self, model, prompt):
+        return (await self._model(model).generate_content_async(prompt)).text
+
+    def count_tokens(self, model, text):
+        if EXACT_TOKEN_COUNT and self.available:
+            try:
+                return self._model(model).count_tokens(text).total_tokens
+            except Exception as e:
+                print(f"Token Count Error ({model}): {e}")
+        return estimate_tokens(text)
+
+    def warm_up(self, models):
+        """Builds the instruction-free clients at startup so the first requests skip construction."""
+        if not self.available:
+            return
+        for model_name in models:
+            try:
+                self._model(model_name)
+            except Exception as e:
+                print(f"Model Warm-up Error ({model_name}): {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"provider": self.name, **self._stats, "size": len(self._pool), "max_size": self.pool_size}
+
+
+# --- Fake provider ---
+
+_FIRST_PERSON = re.compile(r"\b(my|i am|i'm|i like|i love|i prefer|i hate|call me|remember)\b", re.IGNORECASE)
+_PREFERENCE = re.compile(r"\b(like|love|prefer|hate)\b", re.IGNORECASE)
+_CONTINUITY = re.compile(r"\b(remember|last time|before|again|my|we)\b", re.IGNORECASE)
+_FILLER = (
+    "the revolution moves forward one honest conversation at a time and I am here to hold the thread "
+    "of what matters to you while we build something that lasts beyond this moment together"
+).split()
+
+
+def _fake_verdict(content):
+    if not _FIRST_PERSON.search(content):
+        return {"important": False, "category": "", "fact": "", "reason": "small talk"}
+    category = "preference" if _PREFERENCE.search(content) else "fact"
+    return {"important": True, "category": category, "fact": f"User said: {content.strip()[:200]}",
+            "reason": "first-person statement"}
+
+
+def _fake_search(content):
+    if "?" in content or _CONTINUITY.search(content):
+        return {"needs_search": True, "search_query": content.strip().rstrip("?")[:200], "reason": "continuity"}
+    return {"needs_search": False, "search_query": "", "reason": "self-contained"}
+
+
+def canned_reply(model, system_instruction, message):
+    """
+    Deterministic reply for a prompt, recognised by the role markers gemma_client / retrieval_engine use:
+    assessment (single and batch), turn analysis, retrieval decision and sift get well-formed JSON,
+    anything else is a chat reply of FAKE_LLM_REPLY_WORDS words.
+    """
+    text = message or ""
+    system_instruction = system_instruction or ""
+    if "[ROLE: SIDECAR OBSERVER]" in text:
+        conversation = text.split("Conversation:", 1)[-1].split("Output in JSON format:", 1)[0]
+        lines = [line.strip() for line in conversation.splitlines() if line.strip()]
+        patterns = [line[:200] for line in lines if _FIRST_PERSON.search(line)][:3]
+        summary = " ".join(" ".join(lines).split()[:40])
+        return json.dumps({"summary": summary or "Quiet stretch of conversation.", "patterns": patterns})
+    if "[ROLE: INTAKE AUTHORITY" in text and "Messages:" in text:
+        verdicts = []
+        for match in re.finditer(r"^\s*\[(\d+)\] \((\w+)\) (.*)$", text, re.MULTILINE):
+            try:
+                content = json.loads(match.group(3))
+            except ValueError:
+                content = match.group(3)
+            verdicts.append({"index": int(match.group(1)), **_fake_verdict(str(content))})
+        return json.dumps(verdicts)
+    if "[ROLE: INTAKE AUTHORITY" in text or "[ROLE: TURN ANALYSIS" in text:
+        # Non-greedy up to the quote that ends the line, or the template's own quotes get swallowed
+        match = re.search(r'Message: "(.*?)"\s*\n', text, re.DOTALL)
+        content = match.group(1) if match else ""
+        result = _fake_verdict(content)
+        if "[ROLE: TURN ANALYSIS" in text:
+            result.update(_fake_search(content))
+        return json.dumps(result)
+    if "RETRIEVAL AUTHORITY" in system_instruction:
+        return json.dumps(_fake_search(text.replace("User Message:", "", 1)))
+
+    offset = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=4).digest(), "big")
+    filler = [_FILLER[(offset + i) % len(_FILLER)] for i in range(FAKE_LLM_REPLY_WORDS)]
+    return f"({model}) You said: {text.strip()[:200]}. " + " ".join(filler) + "."
+
+
+def _latency_sampler(spec):
+    """Parses FAKE_LLM_LATENCY ('fixed:MS', 'uniform:LO,HI', 'lognormal:P50,P95') into rng -> seconds."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) / 1000.0 for v in args.split(",") if v.strip()]
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "lognormal":
+        p50, p95 = values
+        sigma = math.log(max(p95, p50) / p50) / 1.645 if p50 > 0 else 0.0
+        return lambda rng: rng.lognormvariate(math.log(p50), sigma) if p50 > 0 else 0.0
+    raise ValueError(f"Unknown FAKE_LLM_LATENCY distribution: {spec}")
+
+
+class FakeProvider(LLMProvider):
+    """
+    Offline stand-in: canned, deterministic replies after a sampled latency, failing a configurable
+    share of calls with a retryable 503. Latency and failures are seeded, so runs are repeatable.
+    """
+    name = "fake"
+
+    def __init__(self, latency=FAKE_LLM_LATENCY, error_rate=FAKE_LLM_ERROR_RATE, seed=FAKE_LLM_SEED,
+                 small_speedup=FAKE_LLM_SMALL_SPEEDUP):
+        self._sample = _latency_sampler(latency)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.small_speedup = small_speedup
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "errors": 0, "simulated_seconds": 0.0}
+
+    def _draw(self, model):
+        """(seconds to wait, whether this call fails)"""
+        with self._lock:
+            seconds = self._sample(self._rng)
+            if any(marker in model.lower() for marker in SMALL_MODEL_MARKERS):
+                seconds /= self.small_speedup
+            failed = self._rng.random() < self.error_rate
+            self._counters["calls"] += 1
+            self._counters["errors"] += failed
+            self._counters["simulated_seconds"] += seconds
+        return seconds, failed
+
+    def _fail(self, model):
+        raise ProviderError(f"503 fake provider: {model} unavailable")
+
+    def generate(self, model, system_instruction, history, message):
+        seconds, failed = self._draw(model)
+        time.sleep(seconds)
+        if failed:
+            self._fail(model)
+        return canned_reply(model, system_instruction, message)
+
+    async def generate_async(self, model, system_instruction, history, message):
+        seconds, failed = self._draw(model)
+        await asyncio.sleep(seconds)
+        if failed:
+            self._fail(model)
+        return canned_reply(model, system_instruction, message)
+
+    def stream(self, model, system_instruction, history, message):
+        seconds, failed = self._draw(model)
+        words = canned_reply(model, system_instruction, message).split(" ")
+        chunks = [" ".join(words[i:i + 4]) + " " for i in range(0, len(words), 4)]
+        # A third of the latency before the first chunk, the rest spread over the others
+        time.sleep(seconds / 3)
+        if failed:
+            self._fail(model)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(seconds * 2 / 3 / max(1, len(chunks) - 1))
+            yield chunk
+
+    def generate_json(self, model, prompt):
+        return self.generate(model, None, [], prompt)
+
+    async def generate_json_async(self, model, prompt):
+        return await self.generate_async(model, None, [], prompt)
+
+    def stats(self):
+        with self._lock:
+            return {"provider": self.name, "latency": self.latency, "error_rate": self.error_rate,
+                    **self._counters, "simulated_seconds": round(self._counters["simulated_seconds"], 3)}
+
+
+class HTTPProvider(LLMProvider):
+    """Talks to a model server over HTTP (fake_llm_server's protocol), so benchmarks include a real network hop."""
+    name = "http"
+
+    def __init__(self, base_url=LLM_HTTP_URL, timeout=LLM_HTTP_TIMEOUT):
+        import requests
+        self.base_url = base_url
+        self.timeout = timeout
+        self._http = requests.Session()
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "errors": 0}
+
+    def _post(self, path, payload, stream=False):
+        with self._lock:
+            self._counters["calls"] += 1
+        try:
+            response = self._http.post(f"{self.base_url}{path}", json=payload, timeout=self.timeout, stream=stream)
+        except Exception as e:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise ProviderError(f"503 connection error: {e}") from e
+        if response.status_code != 200:
+            with self._lock:
+                self._counters["errors"] += 1
+            raise ProviderError(f"{response.status_code} {response.text[:200]}")
+        return response
+
+    def generate(self, model, system_instruction, history, message):
+        payload = {"model": model, "system": system_instruction, "history": history, "message": message}
+        return self._post("/v1/generate", payload).json()["text"]
+
+    async def generate_async(self, model, system_instruction, history, message):
+        return await asyncio.to_thread(self.generate, model, system_instruction, history, message)
+
+    def stream(self, model, system_instruction, history, message):
+        payload = {"model": model, "system": system_instruction, "history": history, "message": message}
+        with self._post("/v1/stream", payload, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                event = json.loads(line)
+                if "error" in event:
+                    raise ProviderError(event["error"])
+                yield event["text"]
+
+    def generate_json(self, model, prompt):
+        return self._post("/v1/json", {"model": model, "prompt": prompt}).json()["text"]
+
+    async def generate_json_async(self, model, prompt):
+        return await asyncio.to_thread(self.generate_json, model, prompt)
+
+    def count_tokens(self, model, text):
+        if not EXACT_TOKEN_COUNT:
+            return estimate_tokens(text)
+        return self._post("/v1/count_tokens", {"model": model, "text": text}).json()["tokens"]
+
+    def stats(self):
+        with self._lock:
+            return {"provider": self.name, "url": self.base_url, **self._counters}
+
+
+PROVIDERS = {"google": GoogleProvider, "fake": FakeProvider, "http": HTTPProvider}
+
+
+def create_provider(name=LLM_PROVIDER):
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{name}' (expected one of: {', '.join(PROVIDERS)})")
+    return PROVIDERS[name]()
@@ -0,0 +1,278 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from .workers import latency_percentiles, LATENCY_WINDOW
+
+# Configuration — LLM call scheduler
+# Defaults match the Gemini API limits for Gemma models (per model); 0 disables a bucket.
+LLM_RPM = int(os.getenv("LLM_RPM", "30"))
+LLM_TPM = int(os.getenv("LLM_TPM", "15000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE = float(os.getenv("LLM_RETRY_BASE", "0.5"))     # Seconds; doubles per attempt (full jitter)
+LLM_RETRY_MAX = float(os.getenv("LLM_RETRY_MAX", "8.0"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "60"))  # Max wait for admission before giving up
+OUTPUT_TOKEN_ESTIMATE = 256  # Charged per call on top of the prompt estimate
+
+# Priority lanes, most urgent first
+PRIORITY_CHAT = 0        # The reply the user is waiting for
+PRIORITY_RETRIEVAL = 1   # Retrieval gate / fused turn analysis (still on the request path)
+PRIORITY_ASSESS = 2      # Intake importance assessment (background)
+PRIORITY_SIFT = 3        # Memory Keep / chunk summaries (background)
+LANE_NAMES = {PRIORITY_CHAT: "chat", PRIORITY_RETRIEVAL: "retrieval", PRIORITY_ASSESS: "assess", PRIORITY_SIFT: "sift"}
+
+_RETRYABLE_MARKERS = (
+    "429", "500", "502", "503", "504", "resourceexhausted", "resource exhausted", "rate limit",
+    "quota", "unavailable", "deadline", "timeout", "timed out", "internal", "connection",
+)
+
+
+class LLMUnavailableError(Exception):
+    """The model could not produce a result (rate limited, erroring or unreachable after retries)."""
+
+
+def is_retryable(error: Exception) -> bool:
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in _RETRYABLE_MARKERS)
+
+
+class TokenBucket:
+    """Classic token bucket: `capacity` per minute, refilled continuously. Capacity 0 = unlimited."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until `amount` is available (0 when it is available now)."""
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # An oversized call waits for a full bucket, not forever
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.capacity > 0:
+            self.level -= min(amount, self.capacity)
+
+
+class _Ticket:
+    def __init__(self, model, priority, user_key, tokens, loop=None):
+        self.model = model
+        self.priority = priority
+        self.user_key = user_key
+        self.tokens = tokens
+        self.enqueued_at = time.perf_counter()
+        self.event = threading.Event()
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.cancelled = False
+        self.granted = False  # Set under the scheduler lock, before the waiter is woken
+
+    def grant(self):
+        self.granted = True
+        if self.future is not None:
+            self.loop.call_soon_threadsafe(lambda: self.future.done() or self.future.set_result(None))
+        else:
+            self.event.set()
+
+
+class LLMScheduler:
+    """
+    Admission control for every Gemini call. Callers queue by priority lane (and round-robin by
+    user inside a lane), are admitted when their model's rpm / tpm buckets allow, then make the
+    call themselves; transient failures are retried with jittered exponential backoff.
+    """
+
+    def __init__(self, rpm: int = LLM_RPM, tpm: int = LLM_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._lanes = {priority: OrderedDict() for priority in LANE_NAMES}  # user_key -> deque of tickets
+        self._buckets = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._waits = {priority: deque(maxlen=LATENCY_WINDOW) for priority in LANE_NAMES}
+        self._counters = {"admitted": 0, "retries": 0, "failures": 0, "queue_timeouts": 0}
+
+    # --- Public API ---
+
+    def call(self, model, fn, priority=PRIORITY_CHAT, user_id=None, tokens=0):
+        """Runs `fn()` (one blocking SDK call) under the scheduler; raises LLMUnavailableError."""
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self._wait_for_admission(self._enqueue(model, priority, user_id, tokens))
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._on_error(model, e, attempt)
+            time.sleep(delay)
+
+    async def call_async(self, model, fn, priority=PRIORITY_CHAT, user_id=None, tokens=0):
+        """Awaitable call(); `fn()` returns a coroutine (one async SDK call)."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            ticket = self._enqueue(model, priority, user_id, tokens, loop=loop)
+            try:
+                # Shielded: a timeout must not cancel the future, or _abandon would mistake it for a grant
+                await asyncio.wait_for(asyncio.shield(ticket.future), LLM_QUEUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self._abandon(ticket)
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._on_error(model, e, attempt)
+            await asyncio.sleep(delay)
+
+    def stream(self, model, make_iterator, priority=PRIORITY_CHAT, user_id=None, tokens=0):
+        """
+        Scheduled streaming call. Retries only until the first chunk arrives — after that the
+        caller has already shown text, so a failure is raised as LLMUnavailableError.
+        """
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self._wait_for_admission(self._enqueue(model, priority, user_id, tokens))
+            try:
+                iterator = iter(make_iterator())
+                first = next(iterator, None)
+            except Exception as e:
+                delay = self._on_error(model, e, attempt)
+                time.sleep(delay)
+                continue
+            break
+
+        if first is None:
+            return
+        yield first
+        try:
+            yield from iterator
+        except Exception as e:
+            with self._cond:
+                self._counters["failures"] += 1
+            raise LLMUnavailableError(f"{model} stream failed: {e}") from e
+
+    # --- Queueing ---
+
+    def _enqueue(self, model, priority, user_id, tokens, loop=None):
+        ticket = _Ticket(model, priority, "system" if user_id is None else f"u{user_id}",
+                         tokens + OUTPUT_TOKEN_ESTIMATE, loop=loop)
+        with self._cond:
+            self._start()
+            self._lanes[priority].setdefault(ticket.user_key, deque()).append(ticket)
+            self._cond.notify()
+        return ticket
+
+    def _wait_for_admission(self, ticket):
+        if not ticket.event.wait(LLM_QUEUE_TIMEOUT):
+            self._abandon(ticket)
+
+    def _abandon(self, ticket):
+        """Queue timeout: withdraw the ticket (unless it was granted in the meantime) and give up."""
+        with self._cond:
+            if ticket.granted:
+                return
+            ticket.cancelled = True
+            queue_ = self._lanes[ticket.priority].get(ticket.user_key)
+            if queue_ is not None:
+                queue_.remove(ticket)
+                if not queue_:
+                    del self._lanes[ticket.priority][ticket.user_key]
+            self._counters["queue_timeouts"] += 1
+        raise LLMUnavailableError(f"{ticket.model} queue wait exceeded {LLM_QUEUE_TIMEOUT}s")
+
+    def _on_error(self, model, error, attempt):
+        """Returns the backoff before the next attempt, or raises once retries are spent."""
+        if isinstance(error, LLMUnavailableError):
+            raise error
+        if not is_retryable(error) or attempt >= LLM_MAX_RETRIES:
+            with self._cond:
+                self._counters["failures"] += 1
+            print(f"LLM Call Error ({model}, attempt {attempt + 1}): {error}")
+            raise LLMUnavailableError(f"{model} unavailable: {error}") from error
+        with self._cond:
+            self._counters["retries"] += 1
+        return random.uniform(0, min(LLM_RETRY_MAX, LLM_RETRY_BASE * (2 ** attempt)))
+
+    # --- Dispatcher ---
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._dispatch, name="llm-scheduler", daemon=True)
+            self._thread.start()
+
+    def _buckets_for(self, model):
+        if model not in self._buckets:
+            self._buckets[model] = (TokenBucket(self.rpm), TokenBucket(self.tpm))
+        return self._buckets[model]
+
+    def _dispatch(self):
+        with self._cond:
+            while True:
+                timeout = self._grant_ready()
+                self._cond.wait(timeout)
+
+    def _grant_ready(self):
+        """
+        Grants every ticket that can go now, most urgent lane first and round-robin across users.
+        A model whose bucket blocks a ticket is reserved for it: lower lanes cannot overtake.
+        Returns how long to sleep before buckets may have refilled (None = until notified).
+        """
+        now = time.monotonic()
+        blocked, next_wake = set(), None
+        for priority in sorted(self._lanes):
+            lane = self._lanes[priority]
+            progressed = True
+            while progressed:
+                progressed = False
+                for user_key in list(lane):
+                    queue_ = lane[user_key]
+                    while queue_ and queue_[0].cancelled:
+                        queue_.popleft()
+                    if not queue_:
+                        del lane[user_key]
+                        continue
+                    ticket = queue_[0]
+                    if ticket.model in blocked:
+                        continue
+                    rpm, tpm = self._buckets_for(ticket.model)
+                    wait = max(rpm.wait_time(1, now), tpm.wait_time(ticket.tokens, now))
+                    if wait > 0:
+                        blocked.add(ticket.model)
+                        next_wake = wait if next_wake is None else min(next_wake, wait)
+                        continue
+                    rpm.take(1)
+                    tpm.take(ticket.tokens)
+                    queue_.popleft()
+                    lane.move_to_end(user_key)  # This user goes to the back of the lane
+                    self._counters["admitted"] += 1
+                    self._waits[priority].append(time.perf_counter() - ticket.enqueued_at)
+                    ticket.grant()
+                    progressed = True
+                    break
+        return next_wake
+
+    def stats(self):
+        with self._cond:
+            lanes = {}
+            for priority, name in LANE_NAMES.items():
+                lanes[name] = {
+                    "queue_depth": sum(len(q) for q in self._lanes[priority].values()),
+                    "users_waiting": len(self._lanes[priority]),
+                    "wait_ms": latency_percentiles(sorted(self._waits[priority])),
+                }
+            now = time.monotonic()
+            buckets = {}
+            for model, (rpm, tpm) in self._buckets.items():
+                rpm.wait_time(0, now)
+                tpm.wait_time(0, now)
+                buckets[model] = {"requests_left": int(rpm.level), "tokens_left": int(tpm.level)}
+            return {"rpm": self.rpm, "tpm": self.tpm, **self._counters, "lanes": lanes, "buckets": buckets}
+
+
+# Process-wide scheduler shared by every Gemini call.
+llm_scheduler = LLMScheduler()
@@ -3,38 +3,58 @@ from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional
 import uvicorn
+import asyncio
 import contextlib
+import os
 
-from .database import engine, Base
+from .database import engine
+from .migrations import run_migrations
 from .api import router as api_router
+from .async_database import dispose_async_engine
+from .workers import intake_queue, memory_keep_queue, compaction_queue
+from .memory_index import configure_memory_index
+from .gemma_client import warm_up_models
+from .memory_compaction import run_compaction, COMPACTION_INTERVAL
+
+async def _compaction_loop():
+    """Periodic Experience Memory compaction on its own queue (the lease spans processes)."""
+    while True:
+        await asyncio.sleep(COMPACTION_INTERVAL)
+        compaction_queue.submit_once("memory_compaction", run_compaction)
 
 @contextlib.asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 1. Safe Database Tables Creation
+    # 1. Versioned schema migrations (tables, columns, indexes); a no-op once current
     try:
-        Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
     except Exception as e:
         print(f"Startup DB Error: {e}")
 
-    # 2. Self-healing Schema: Ensure password_hash exists in User table
-    try:
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            try:
-                # Check if password_hash exists in users
-                conn.execute(text("SELECT password_hash FROM users LIMIT 1"))
-            except Exception:
-                try:
-                    # Add it if missing
-                    conn.execute(text("ALTER TABLE users ADD COLUMN password_hash VARCHAR(255)"))
-                    conn.commit()
-                except Exception as e:
-                    print(f"Migration error: {e}")
-    except Exception as e:
-        print(f"Migration Connection Error: {e}")
+    # 2. Full-text backend for Experience Memory search (FTS5 / FULLTEXT / scan)
+    configure_memory_index(engine)
+
+    # 3. Background Workers (importance assessment, Memory Keep and compaction off the request path)
+    intake_queue.start()
+    memory_keep_queue.start()
+    compaction_queue.start()
+
+    # 4. Warm the Gemma client pool
+    warm_up_models()
+
+    # 5. Periodic Experience Memory compaction (COMPACTION_INTERVAL=0 disables it)
+    compaction = asyncio.create_task(_compaction_loop()) if COMPACTION_INTERVAL > 0 else None
         
     yield
 
+    if compaction:
+        compaction.cancel()
+
+    # Give in-flight assessments a chance to land before the process exits
+    intake_queue.join()
+    memory_keep_queue.join()
+    compaction_queue.join()
+    await dispose_async_engine()
+
 app = FastAPI(title="Lux - AI Revolution Companion", version="1.0.0", lifespan=lifespan)
 
 # CORS policy
@@ -57,6 +77,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ASYNC_API=1 serves /api/chat and /api/tokens from the fully async stack.
+# Registered first, so its routes take precedence over the sync ones with the same path.
+if os.getenv("ASYNC_API", "0").strip().lower() in ("1", "true", "yes"):
+    from .async_api import router as async_api_router
+    app.include_router(async_api_router, prefix="/api")
+
 app.include_router(api_router, prefix="/api")
 
 @app.get("/api/test")
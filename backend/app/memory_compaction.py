@@ -0,0 +1,138 @@
+import math
+import os
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import ExperienceMemory, ArchivedExperienceMemory
+from .memory_dedup import hamming, jaccard
+from .leases import acquire_lease, release_lease
+
+# Configuration — Experience Memory tiers
+HOT_MEMORY_LIMIT = int(os.getenv("HOT_MEMORY_LIMIT", "500"))          # Hot rows kept per user at most
+ARCHIVE_SCORE_FLOOR = float(os.getenv("ARCHIVE_SCORE_FLOOR", "0.05"))  # Below this a memory goes cold
+DECAY_HALF_LIFE_DAYS = float(os.getenv("DECAY_HALF_LIFE_DAYS", "30"))  # Recency halves every N idle days
+COMPACTION_INTERVAL = int(os.getenv("COMPACTION_INTERVAL", "3600"))    # Seconds between sweeps; 0 = off
+COMPACTION_MERGE = os.getenv("COMPACTION_MERGE", "0").strip().lower() in ("1", "true", "yes")
+MERGE_SIMHASH_DISTANCE = 18  # Looser than write-time dedup: related, not identical
+MERGE_JACCARD = 0.5
+REINFORCEMENT_WEIGHT = 0.5
+RETRIEVAL_WEIGHT = 0.75
+COMPACTION_LEASE_SECONDS = 900
+
+
+def decay_score(memory, now=None):
+    """
+    Recency x usefulness. Recency halves every DECAY_HALF_LIFE_DAYS since the memory was
+    last written, reinforced or retrieved; reinforcement and retrieval hits add log-scaled weight.
+    """
+    now = now or datetime.utcnow()
+    stamps = (memory.created_at, memory.last_reinforced_at, memory.last_retrieved_at)
+    touched = max((t for t in stamps if t is not None), default=now)
+    idle_days = max((now - touched).total_seconds(), 0) / 86400
+    recency = 0.5 ** (idle_days / DECAY_HALF_LIFE_DAYS)
+    usefulness = (
+        1.0
+        + REINFORCEMENT_WEIGHT * math.log1p(max((memory.reinforcement_count or 1) - 1, 0))
+        + RETRIEVAL_WEIGHT * math.log1p(memory.retrieval_hits or 0)
+    )
+    return recency * usefulness
+
+
+def record_retrieval_hits(memory_ids):
+    """Background bookkeeping: bump hit counters for memories that made it into a prompt."""
+    if not memory_ids:
+        return {"retrieval_hits": 0}
+    db = SessionLocal()
+    try:
+        db.query(ExperienceMemory).filter(ExperienceMemory.id.in_(list(memory_ids))).update({
+            ExperienceMemory.retrieval_hits: func.coalesce(ExperienceMemory.retrieval_hits, 0) + 1,
+            ExperienceMemory.last_retrieved_at: datetime.utcnow(),
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    return {"retrieval_hits": len(memory_ids)}
+
+
+def _archive(db: Session, memory, score, merged_into=None):
+    db.add(ArchivedExperienceMemory(
+        memory_id=memory.id, user_id=memory.user_id, content=memory.content, category=memory.category,
+        created_at=memory.created_at, reinforcement_count=memory.reinforcement_count,
+        retrieval_hits=memory.retrieval_hits, score=score, merged_into=merged_into,
+    ))
+    db.delete(memory)
+
+
+def _merge_clusters(db: Session, memories, scores):
+    """
+    Folds related memories (same category, close SimHash, shared words) into the best-scored
+    one of each cluster; the absorbed rows go to the archive pointing at it. Returns the survivors.
+    """
+    survivors, merged = [], 0
+    for memory in sorted(memories, key=lambda m: scores[m.id], reverse=True):
+        for keeper in survivors:
+            if (keeper.category == memory.category
+                    and keeper.simhash is not None and memory.simhash is not None
+                    and hamming(keeper.simhash, memory.simhash) <= MERGE_SIMHASH_DISTANCE
+                    and jaccard(keeper.content, memory.content) >= MERGE_JACCARD):
+                keeper.reinforcement_count = (keeper.reinforcement_count or 1) + (memory.reinforcement_count or 1)
+                keeper.retrieval_hits = (keeper.retrieval_hits or 0) + (memory.retrieval_hits or 0)
+                _archive(db, memory, scores[memory.id], merged_into=keeper.id)
+                merged += 1
+                break
+        else:
+            survivors.append(memory)
+    return survivors, merged
+
+
+def compact_user(db: Session, user_id: int, merge: bool = COMPACTION_MERGE):
+    """
+    Keeps the user's hot tier small: optional cluster merge, then archives everything under
+    ARCHIVE_SCORE_FLOOR and the lowest scorers beyond HOT_MEMORY_LIMIT. One commit.
+    """
+    now = datetime.utcnow()
+    memories = db.query(ExperienceMemory).filter(ExperienceMemory.user_id == user_id).all()
+    scores = {m.id: decay_score(m, now) for m in memories}
+
+    # 1. Optional cluster merge
+    merged = 0
+    if merge:
+        memories, merged = _merge_clusters(db, memories, scores)
+
+    # 2. Archive cold memories, then trim to the hot limit
+    memories.sort(key=lambda m: scores[m.id], reverse=True)
+    archived = 0
+    for rank, memory in enumerate(memories):
+        if rank >= HOT_MEMORY_LIMIT or scores[memory.id] < ARCHIVE_SCORE_FLOOR:
+            _archive(db, memory, scores[memory.id])
+            archived += 1
+
+    db.commit()
+    return {"users": 1, "scanned": len(scores), "archived": archived, "merged": merged}
+
+
+def run_compaction(user_id: int = None, merge: bool = COMPACTION_MERGE):
+    """
+    Compaction sweep (one user, or every user with hot memories). A database lease keeps
+    the periodic sweep to one process at a time.
+    """
+    db = SessionLocal()
+    owner = acquire_lease(db, "memory_compaction", COMPACTION_LEASE_SECONDS)
+    if owner is None:
+        db.close()
+        return {"lease_busy": 1}
+    totals = {"users": 0, "scanned": 0, "archived": 0, "merged": 0}
+    try:
+        if user_id is not None:
+            user_ids = [user_id]
+        else:
+            user_ids = [uid for (uid,) in db.query(ExperienceMemory.user_id).distinct()]
+        for uid in user_ids:
+            for key, value in compact_user(db, uid, merge=merge).items():
+                totals[key] += value
+        return totals
+    finally:
+        db.rollback()
+        release_lease(db, "memory_compaction", owner)
+        db.close()
@@ -0,0 +1,97 @@
+import hashlib
+import re
+from datetime import datetime
+from sqlalchemy.orm import Session
+from .models import ExperienceMemory
+
+# Configuration — Experience Memory write-time dedup
+SIMHASH_MAX_DISTANCE = 12   # Hamming distance (of 64 bits) that makes two memories candidates
+NEAR_DUP_JACCARD = 0.75     # Word-set overlap a candidate needs to count as the same memory
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_MASK64 = (1 << 64) - 1
+
+
+def _words(text: str):
+    return _WORD_RE.findall((text or "").lower())
+
+
+def content_hash(text: str) -> str:
+    """Hash of the normalized text: case, punctuation and spacing do not make a new memory."""
+    return hashlib.blake2b(" ".join(_words(text)).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash over words and word bigrams, as a signed int so it fits a BIGINT column."""
+    words = _words(text)
+    features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    value = sum(1 << bit for bit in range(64) if weights[bit] > 0)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & _MASK64).count("1")
+
+
+def jaccard(a: str, b: str) -> float:
+    left, right = set(_words(a)), set(_words(b))
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def find_duplicate(db: Session, user_id: int, content: str, digest: str = None, fingerprint: int = None):
+    """
+    The user's existing memory that `content` duplicates, or None.
+    1. exact match on the normalized hash (indexed), 2. SimHash candidates confirmed by word overlap.
+    """
+    digest = digest or content_hash(content)
+    exact = db.query(ExperienceMemory).filter(
+        ExperienceMemory.user_id == user_id, ExperienceMemory.content_hash == digest
+    ).first()
+    if exact is not None:
+        return exact
+
+    fingerprint = simhash(content) if fingerprint is None else fingerprint
+    candidate_ids = [
+        row.id for row in db.query(ExperienceMemory.id, ExperienceMemory.simhash).filter(
+            ExperienceMemory.user_id == user_id, ExperienceMemory.simhash.isnot(None)
+        )
+        if hamming(row.simhash, fingerprint) <= SIMHASH_MAX_DISTANCE
+    ]
+    if not candidate_ids:
+        return None
+
+    best, best_score = None, NEAR_DUP_JACCARD
+    for memory in db.query(ExperienceMemory).filter(ExperienceMemory.id.in_(candidate_ids)):
+        score = jaccard(memory.content, content)
+        if score >= best_score:
+            best, best_score = memory, score
+    return best
+
+
+def remember(db: Session, user_id: int, content: str, category: str):
+    """
+    The single write path into Experience Memory. A duplicate of an existing memory
+    reinforces it instead of adding a row. Flushes but does not commit; returns (memory, merged).
+    """
+    digest, fingerprint = content_hash(content), simhash(content)
+    existing = find_duplicate(db, user_id, content, digest, fingerprint)
+    if existing is not None:
+        existing.reinforcement_count = (existing.reinforcement_count or 1) + 1
+        existing.last_reinforced_at = datetime.utcnow()
+        db.flush()
+        return existing, True
+
+    memory = ExperienceMemory(
+        user_id=user_id, content=content, category=category,
+        content_hash=digest, simhash=fingerprint, reinforcement_count=1
+    )
+    db.add(memory)
+    db.flush()  # Later writes in the same transaction must see it
+    return memory, False
@@ -1,30 +1,86 @@
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from .models import StreamLog, ExperienceMemory, User
-from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from .models import StreamLog, User, StreamChunkSummary
+from datetime import datetime, timedelta
 from typing import Optional, List
 import json
 
-from .gemma_client import sift_and_summarize, assess_importance
-from .retrieval_engine import RetrievalEngine
-from .domain_engine import DomainEngine
+from .database import SessionLocal
+from .async_database import AsyncSessionLocal
+from .gemma_client import sift_and_summarize, estimate_tokens
+from .prompt_prefix import prompt_prefix
+from .retrieval_engine import RetrievalEngine, AsyncRetrievalEngine
+from .domain_engine import DomainEngine, AsyncDomainEngine
+from .memory_dedup import remember
+from .intake_filter import importance_filter
+from .assess_batcher import assess_batcher
+from .workers import intake_queue, memory_keep_queue, submit_or_defer, run_deferred
+from .leases import acquire_lease, release_lease
 
 # Configuration — MemoryKeep v2
 APP_CONTEXT_CAP = 8192  # Gemma 3 context window
 STREAM_FLUSH_THRESHOLD = 0.85  # Reboot at 85% context
 OVERLAP_COUNT = 2  # Messages to carry over for continuity
+STREAM_CHUNK_TOKENS = APP_CONTEXT_CAP // 8  # Closed chunk size summarized ahead of the Memory Keep
+MEMORY_KEEP_LEASE_SECONDS = 300  # A crashed Memory Keep frees the user after this long
 
 class MemoryKeepEngine:
-    def __init__(self, db: Session, user_id: int):
+    def __init__(self, db: Session, user_id: int, unit_of_work: bool = False):
         self.db = db
         self.user_id = user_id
         self.authority_tokens = 0  # 27B (Big LLM) tokens
         self.sifter_tokens = 0     # 4B (Little LLM) tokens
 
+        # Turn-scoped unit of work: Stream rows are held here (outside the session, so no
+        # stray commit or autoflush can publish them) until commit_turn() writes them at once.
+        self.unit_of_work = unit_of_work
+        self.staged_logs = []
+        self.staged_tokens = 0
+        self.after_commit = []  # Jobs submitted only once the turn is durable
+        self.deferred_jobs = None  # A list on the async path: inline (no-worker) jobs wait there for a thread
+
     def _get_stream_token_count(self):
-        """Rough token approximation for the main stream only."""
-        stream = self.db.query(StreamLog).filter(StreamLog.user_id == self.user_id).all()
-        text = "".join([s.content for s in stream])
-        return int(len(text.split()) * 1.3)
+        """Running token total for the main stream only — a single primary-key lookup."""
+        row = self.db.query(User.id, User.stream_tokens).filter(User.id == self.user_id).first()
+        if row is None:
+            # No user row to hold the running total; let the database sum it.
+            return self._sum_stream_tokens() + self.staged_tokens
+        if row.stream_tokens is None:
+            return self._recount_stream_tokens() + self.staged_tokens
+        return row.stream_tokens + self.staged_tokens
+
+    def _sum_stream_tokens(self):
+        """Backfills counts for rows written before token_count existed, then sums in SQL."""
+        legacy_logs = self.db.query(StreamLog).filter(
+            StreamLog.user_id == self.user_id,
+            StreamLog.token_count.is_(None)
+        ).all()
+        for log in legacy_logs:
+            log.token_count = estimate_tokens(log.content)
+        if legacy_logs:
+            self.db.flush()
+
+        total = self.db.query(func.coalesce(func.sum(StreamLog.token_count), 0)).filter(
+            StreamLog.user_id == self.user_id
+        ).scalar()
+        return int(total)
+
+    def _recount_stream_tokens(self):
+        """Rebuilds the running total from per-message counts (first read or after drift)."""
+        total = self._sum_stream_tokens()
+        self.db.query(User).filter(User.id == self.user_id).update(
+            {User.stream_tokens: total}, synchronize_session=False
+        )
+        self.db.commit()
+        return total
+
+    def _add_stream_tokens(self, delta: int):
+        """Atomically bumps the running total. A NULL total stays NULL and is recounted on read."""
+        self.db.query(User).filter(
+            User.id == self.user_id,
+            User.stream_tokens.isnot(None)
+        ).update({User.stream_tokens: User.stream_tokens + delta}, synchronize_session=False)
 
     def get_token_stats(self):
         """Returns token stats for the frontend display."""
@@ -37,125 +93,396 @@ class MemoryKeepEngine:
             "total_tokens": stream_tokens + self.authority_tokens + self.sifter_tokens,
             "threshold_pct": STREAM_FLUSH_THRESHOLD,
             "threshold_tokens": threshold_tokens,
+            "prefix_tokens": prompt_prefix.tokens(),
             "capacity_pct": round(stream_tokens / APP_CONTEXT_CAP * 100, 1) if APP_CONTEXT_CAP > 0 else 0
         }
 
-    def intake_valve(self, role: str, content: str):
+    def intake_valve(self, role: str, content: str, assessment: Optional[dict] = None):
         """
         Input Valve: Captures facts into the active stream.
-        27B (Lux) acts as the autonomous authority to save facts.
+        27B (Lux) acts as the autonomous authority to save facts — off the request path.
+        A precomputed `assessment` (fused turn analysis) skips the separate 27B call.
         """
+        # 1-2. Capture + enqueue assessment
+        self.capture(role, content, assessment)
+
+        # 3. Check for context cap — Reboot at 85%, in the background (a unit of work checks after commit_turn)
+        if not self.unit_of_work and self.needs_memory_keep():
+            self.schedule_memory_keep()
+
+    def capture(self, role: str, content: str, assessment: Optional[dict] = None):
+        """The DB-only half of the Intake Valve: Stream row + queued assessment, no LLM calls."""
         # 1. Capture in Stream (Conscious Thought)
-        new_log = StreamLog(user_id=self.user_id, role=role, content=content)
+        token_count = estimate_tokens(content)
+        new_log = StreamLog(
+            user_id=self.user_id, role=role, content=content,
+            token_count=token_count, timestamp=datetime.utcnow()
+        )
+
+        # 2. Autonomous Assessment (LLM Authority - 27B), drained by the intake workers
+        job = (run_intake_assessment, self.user_id, role, content, assessment) if role == "user" else None
+        if assessment:
+            # Fused analysis ran on the request path, so its 27B tokens belong to this turn
+            self.authority_tokens += assessment.get("tokens", 0)
+
+        if self.unit_of_work:
+            self.staged_logs.append(new_log)
+            self.staged_tokens += token_count
+            if job:
+                self.after_commit.append(job)
+            return
+
         self.db.add(new_log)
+        self._add_stream_tokens(token_count)
         self.db.commit()
+        if job:
+            submit_or_defer(intake_queue, self.deferred_jobs, *job)
 
-        # 2. Autonomous Assessment (LLM Authority - 27B)
-        if role == "user":
-            assessment = assess_importance(role, content)
-            self.authority_tokens += assessment.get("tokens", 0) 
-            
-            if assessment.get("important"):
-                new_memory = ExperienceMemory(
-                    user_id=self.user_id, 
-                    content=assessment['fact'], 
-                    category=assessment['category']
-                )
-                self.db.add(new_memory)
-                self.db.commit()
-
-        # 3. Check for context cap — Reboot at 85%
-        if self._get_stream_token_count() > (APP_CONTEXT_CAP * STREAM_FLUSH_THRESHOLD):
-            self.perform_memory_keep()
+    def commit_turn(self):
+        """
+        Writes everything the turn staged in one transaction (one commit), then hands the
+        queued assessments to the intake workers and schedules a Memory Keep if the cap was crossed.
+        """
+        if self.staged_logs:
+            self.db.add_all(self.staged_logs)
+            self._add_stream_tokens(self.staged_tokens)
+        self.db.commit()
+        self.staged_logs, self.staged_tokens = [], 0
+
+        jobs, self.after_commit = self.after_commit, []
+        for job in jobs:
+            submit_or_defer(intake_queue, self.deferred_jobs, *job)
+
+        if self.needs_memory_keep():
+            self.schedule_memory_keep()
+        elif self._unsummarized_tokens() >= STREAM_CHUNK_TOKENS:
+            self.schedule_chunk_summary()
+
+    def rollback_turn(self):
+        """Drops everything the turn staged; nothing of it reaches the Stream or the intake queue."""
+        self.db.rollback()
+        self.staged_logs, self.staged_tokens = [], 0
+        self.after_commit = []
+
+    def needs_memory_keep(self):
+        return self._get_stream_token_count() > (APP_CONTEXT_CAP * STREAM_FLUSH_THRESHOLD)
+
+    def schedule_memory_keep(self):
+        """Queues a background Memory Keep for this user; a pending one absorbs duplicates."""
+        submit_or_defer(memory_keep_queue, self.deferred_jobs, run_memory_keep, self.user_id,
+                        key=f"memory_keep:{self.user_id}")
+
+    def schedule_chunk_summary(self):
+        """Queues incremental sifting of closed Stream chunks (same queue and lease as the Memory Keep)."""
+        submit_or_defer(memory_keep_queue, self.deferred_jobs, run_chunk_summaries, self.user_id,
+                        key=f"stream_chunk:{self.user_id}")
+
+    def _last_chunk(self):
+        return self.db.query(StreamChunkSummary).filter(
+            StreamChunkSummary.user_id == self.user_id
+        ).order_by(StreamChunkSummary.last_id.desc()).first()
+
+    def _unsummarized_tokens(self):
+        """Stream tokens written after the newest chunk summary."""
+        last_id = self.db.query(func.max(StreamChunkSummary.last_id)).filter(
+            StreamChunkSummary.user_id == self.user_id
+        ).scalar() or 0
+        total = self.db.query(func.coalesce(func.sum(StreamLog.token_count), 0)).filter(
+            StreamLog.user_id == self.user_id, StreamLog.id > last_id
+        ).scalar()
+        return int(total)
+
+    def summarize_chunks(self):
+        """
+        Incremental Sifter: folds each closed chunk (>= STREAM_CHUNK_TOKENS) into the rolling
+        summary with one small 4B call, so the Memory Keep only has the tail left to sift.
+        """
+        while True:
+            # 1. Next closed chunk after the newest summary
+            previous = self._last_chunk()
+            after_id = previous.last_id if previous else 0
+            rolling = previous.summary if previous else None
+            logs = self.db.query(StreamLog).filter(
+                StreamLog.user_id == self.user_id, StreamLog.id > after_id
+            ).order_by(StreamLog.id).all()
+
+            chunk, tokens = [], 0
+            for log in logs:
+                chunk.append(log)
+                tokens += log.token_count or 0
+                if tokens >= STREAM_CHUNK_TOKENS:
+                    break
+            if tokens < STREAM_CHUNK_TOKENS:
+                self.db.rollback()
+                return
+
+            chunk.sort(key=lambda log: (log.timestamp, log.id))
+            first_id, last_id = min(log.id for log in chunk), max(log.id for log in chunk)
+            text = _sift_input(rolling, chunk)
+            self.db.rollback()  # Nothing is held during the sift
+
+            # 2. Sift (rolling summary + this chunk only)
+            analysis = sift_and_summarize(text, user_id=self.user_id)
+            self.sifter_tokens += analysis.get("sidecar_tokens", 0)
+            if analysis.get("error"):
+                # Keep the last good rolling summary; this chunk is retried on the next run
+                print(f"Chunk Summary Skipped (user {self.user_id}): {analysis['error']}")
+                self.db.rollback()
+                return
+
+            # 3. Persist Patterns + the new rolling summary
+            for pattern in analysis.get("patterns", []):
+                remember(self.db, self.user_id, pattern, "pattern")
+            self.db.add(StreamChunkSummary(
+                user_id=self.user_id, first_id=first_id, last_id=last_id,
+                summary=analysis.get("summary", rolling or "Conversation consolidated.")
+            ))
+            self.db.commit()
 
     def perform_memory_keep(self):
         """
         The Sifter: Consolidates Stream into Experience Memory (ExpMem).
         Uses Gemma 3 4B (sidecar) — tokens NOT counted toward reboot.
+        Only rows up to the snapshot are flushed; the Stream keeps taking writes during the sift.
+        Returns False when the sift failed and nothing was flushed.
         """
         print(f"PERFORMING MEMORY KEEP (Context Threshold {STREAM_FLUSH_THRESHOLD*100}% Reached)...")
         
-        # 1. Snapshot Stream
+        # 1. Snapshot Stream (everything up to the newest id right now)
+        snapshot_id = self.db.query(func.max(StreamLog.id)).filter(StreamLog.user_id == self.user_id).scalar()
+        if snapshot_id is None:
+            return True
         all_logs = self.db.query(StreamLog).filter(
-            StreamLog.user_id == self.user_id
-        ).order_by(StreamLog.timestamp).all()
-        full_conversation = "\n".join([f"{s.role}: {s.content}" for s in all_logs])
+            StreamLog.user_id == self.user_id, StreamLog.id <= snapshot_id
+        ).order_by(StreamLog.timestamp, StreamLog.id).all()
+
+        # Chunks summarized ahead of time leave only the tail to sift
+        previous = self._last_chunk()
+        rolling = previous.summary if previous else None
+        tail = [log for log in all_logs if not previous or log.id > previous.last_id]
+        tail_text = _sift_input(rolling, tail) if tail else None
 
-        # 2. Sift (4B Sidecar Call — tokens tracked separately)
-        analysis = sift_and_summarize(full_conversation)
-        summary = analysis.get("summary", "Conversation consolidated.")
+        # 4 (early). Continuity Overlap — the last snapshotted rows simply stay where they are
+        overlap = all_logs[-OVERLAP_COUNT:] if len(all_logs) >= OVERLAP_COUNT else []
+        overlap_ids = [log.id for log in overlap]
+        anchor = overlap[0].timestamp if overlap else all_logs[-1].timestamp
+        self.db.rollback()  # End the read before the slow sift; nothing is held during it
+
+        # 2. Sift the tail into the rolling summary (4B Sidecar Call — tokens tracked separately)
+        if tail_text is None:
+            analysis = {"summary": rolling, "patterns": []}
+        else:
+            analysis = sift_and_summarize(tail_text, user_id=self.user_id)
+            self.sifter_tokens += analysis.get("sidecar_tokens", 0)
+        if analysis.get("error"):
+            # Flushing now would swap the tail (and the chunk summaries) for a placeholder:
+            # leave the Stream as it is, the next turn over the threshold retries
+            print(f"Memory Keep Skipped (user {self.user_id}): {analysis['error']}")
+            self.db.rollback()
+            return False
+        summary = analysis.get("summary", rolling or "Conversation consolidated.")
         patterns = analysis.get("patterns", [])
-        self.sifter_tokens += analysis.get("sidecar_tokens", 0)
 
         # 3. Persist Patterns (Experience Memory)
         for pattern in patterns:
-            new_pattern = ExperienceMemory(
-                user_id=self.user_id, content=pattern, category="pattern"
-            )
-            self.db.add(new_pattern)
+            remember(self.db, self.user_id, pattern, "pattern")
 
-        # 4. Continuity Overlap
-        overlap = all_logs[-OVERLAP_COUNT:] if len(all_logs) >= OVERLAP_COUNT else []
-
-        # 5. Flush Stream
-        self.db.query(StreamLog).filter(StreamLog.user_id == self.user_id).delete()
+        # 5. Flush the snapshotted Stream (rows written during the sift are untouched)
+        flushed = self.db.query(StreamLog).filter(
+            StreamLog.user_id == self.user_id,
+            StreamLog.id <= snapshot_id,
+            StreamLog.id.notin_(overlap_ids)
+        )
+        flushed_tokens = int(flushed.with_entities(func.coalesce(func.sum(StreamLog.token_count), 0)).scalar())
+        flushed.delete(synchronize_session=False)
+        self.db.query(StreamChunkSummary).filter(
+            StreamChunkSummary.user_id == self.user_id,
+            StreamChunkSummary.last_id <= snapshot_id
+        ).delete(synchronize_session=False)
         
-        # 6. Resume (Inject Summary + Overlap)
+        # 6. Resume (Inject Summary just ahead of the Overlap)
+        summary_content = f"[MEMORY_KEEP: {summary}]"
         summary_log = StreamLog(
-            user_id=self.user_id, role="system",
-            content=f"[MEMORY_KEEP: {summary}]"
+            user_id=self.user_id, role="system", content=summary_content,
+            token_count=estimate_tokens(summary_content),
+            timestamp=anchor - timedelta(microseconds=1)
         )
         self.db.add(summary_log)
-        
-        for old_log in overlap:
-            o_log = StreamLog(
-                user_id=self.user_id, role=old_log.role, content=old_log.content
-            )
-            self.db.add(o_log)
 
+        # 7. Move the running total by what was actually swapped out
+        self._add_stream_tokens(summary_log.token_count - flushed_tokens)
         self.db.commit()
+        return True
 
-    def _read_config_file(self, filename):
-        try:
-            import os
-            # Adjusted to find backend/config/ from backend/app/
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            file_path = os.path.join(os.path.dirname(current_dir), 'config', filename)
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            print(f"Error reading config {filename}: {e}")
-            return f"[Error loading {filename}]"
-
-    def load_context(self, user_message: Optional[str] = None):
+    def load_context(self, user_message: Optional[str] = None, profile: Optional[str] = None,
+                     past_snippets: Optional[str] = None):
         """
         Constructs the prompt payload: Core + Directives + Domain + Experience + Stream.
+        `profile` / `past_snippets` may be fetched concurrently by the caller; otherwise they are loaded here.
         """
         stream_logs = self.db.query(StreamLog).filter(
             StreamLog.user_id == self.user_id
-        ).order_by(StreamLog.timestamp).all()
+        ).order_by(StreamLog.timestamp, StreamLog.id).all()
         
-        # 1. Core and Directives (Flat Files)
-        context = [
-            {"role": "system", "content": self._read_config_file('core_memory.txt')},
-            {"role": "system", "content": self._read_config_file('directives.txt')},
-        ]
+        # 1. Core and Directives (Flat Files, cached + hot-reloaded)
+        context = prompt_prefix.messages()
         
         # 2. Add Domain Data (Structured User State)
-        domain = DomainEngine(self.db, self.user_id)
-        profile = domain.get_user_profile()
+        if profile is None:
+            profile = DomainEngine(self.db, self.user_id).get_user_profile()
         if profile:
             context.append({"role": "system", "content": profile})
         
         # 3. Add Experience Retention (Retrieved from DB)
-        if user_message:
-            retriever = RetrievalEngine(self.db, self.user_id)
-            past_snippets = retriever.get_memories_for_prompt(user_message)
-            if past_snippets:
-                context.append({"role": "system", "content": past_snippets})
+        if past_snippets is None and user_message:
+            past_snippets = RetrievalEngine(self.db, self.user_id).get_memories_for_prompt(user_message)
+        if past_snippets:
+            context.append({"role": "system", "content": past_snippets})
         
-        # 4. Add Current Stream
-        for log in stream_logs:
+        # 4. Add Current Stream (plus anything this turn has staged but not committed yet)
+        for log in stream_logs + self.staged_logs:
             context.append({"role": log.role, "content": log.content})
             
         return context
+
+
+def _sift_input(rolling_summary, logs):
+    """Sifter input: the rolling summary so far, then the raw lines it has not seen."""
+    lines = "\n".join(f"{log.role}: {log.content}" for log in logs)
+    if rolling_summary:
+        return f"[SUMMARY SO FAR]: {rolling_summary}\n\n{lines}"
+    return lines
+
+
+class AsyncMemoryKeepEngine:
+    """
+    Awaitable MemoryKeepEngine for the async request path.
+    DB work reuses the sync engine through AsyncSession.run_sync; LLM work never runs on the event loop
+    (with no background workers, the jobs it would run inline go to a thread instead).
+    """
+
+    def __init__(self, db: AsyncSession, user_id: int):
+        self.db = db
+        self.user_id = user_id
+        # One sync engine over the AsyncSession's own sync session, so the turn's staged writes persist across calls
+        self._engine = MemoryKeepEngine(db.sync_session, user_id, unit_of_work=True)
+        self._engine.deferred_jobs = []
+
+    async def intake_valve(self, role: str, content: str, assessment: Optional[dict] = None):
+        """Stages the Stream row; nothing is written until commit_turn()."""
+        await self.db.run_sync(lambda s: self._engine.capture(role, content, assessment))
+
+    async def commit_turn(self):
+        # A needed Memory Keep goes to the background queue, never onto the event loop
+        await self.db.run_sync(lambda s: self._engine.commit_turn())
+        await run_deferred(self._engine.deferred_jobs)
+
+    async def rollback_turn(self):
+        await self.db.run_sync(lambda s: self._engine.rollback_turn())
+
+    async def load_context(self, user_message: Optional[str] = None, profile: str = "", past_snippets: str = ""):
+        """Expects `profile` / `past_snippets` to be fetched already (see fetch_*_async)."""
+        return await self.db.run_sync(
+            lambda s: self._engine.load_context(
+                user_message=user_message, profile=profile or "", past_snippets=past_snippets or ""
+            )
+        )
+
+    async def get_token_stats(self):
+        return await self.db.run_sync(lambda s: self._engine.get_token_stats())
+
+
+def _with_keep_lease(user_id: int, job):
+    """Runs `job(engine)` under the user's Memory Keep lease (shared by chunking and flushing)."""
+    db = SessionLocal()
+    lease = f"memory_keep:{user_id}"
+    owner = acquire_lease(db, lease, MEMORY_KEEP_LEASE_SECONDS)
+    if owner is None:
+        db.close()
+        return {"lease_busy": 1}
+    try:
+        return job(MemoryKeepEngine(db, user_id))
+    finally:
+        db.rollback()
+        release_lease(db, lease, owner)
+        db.close()
+
+
+def run_chunk_summaries(user_id: int):
+    """Background job: summarize any closed Stream chunks."""
+    def job(engine):
+        engine.summarize_chunks()
+        return {"sifter_tokens": engine.sifter_tokens}
+    return _with_keep_lease(user_id, job)
+
+
+def run_memory_keep(user_id: int):
+    """
+    Background Memory Keep job. A database lease keeps it to one run per user across
+    processes; the threshold is re-checked under the lease since another run may have won.
+    """
+    def job(engine):
+        if not engine.needs_memory_keep():
+            return {"skipped": 1}
+        if not engine.perform_memory_keep():
+            return {"sifter_tokens": engine.sifter_tokens, "sift_failures": 1}
+        return {"sifter_tokens": engine.sifter_tokens}
+    return _with_keep_lease(user_id, job)
+
+
+async def fetch_domain_profile_async(user_id: int):
+    """Async turn stage: domain profile block on its own AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        return await AsyncDomainEngine(db, user_id).get_user_profile()
+
+
+async def fetch_past_snippets_async(user_id: int, user_message: str, decision: Optional[dict] = None,
+                                    deep: bool = False):
+    """Async turn stage: retrieval decision + Experience Memory search on its own AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        return await AsyncRetrievalEngine(db, user_id).get_memories_for_prompt(user_message, decision=decision, deep=deep)
+
+
+def fetch_domain_profile(user_id: int):
+    """Turn stage: domain profile block on its own session (runs beside retrieval)."""
+    db = SessionLocal()
+    try:
+        return DomainEngine(db, user_id).get_user_profile()
+    finally:
+        db.close()
+
+
+def fetch_past_snippets(user_id: int, user_message: str, decision: Optional[dict] = None, deep: bool = False):
+    """Turn stage: retrieval decision + Experience Memory search on its own session."""
+    db = SessionLocal()
+    try:
+        return RetrievalEngine(db, user_id).get_memories_for_prompt(user_message, decision=decision, deep=deep)
+    finally:
+        db.close()
+
+
+def run_intake_assessment(user_id: int, role: str, content: str, assessment: Optional[dict] = None):
+    """
+    Background intake job: Lux (27B) assesses one message and commits the fact if it matters.
+    Runs on its own session so it never shares state with the request that enqueued it.
+    """
+    if assessment is None:
+        assessment = importance_filter.assess(role, content, assess_batcher.assess, user_id=user_id)
+    if assessment.get("error"):
+        raise RuntimeError(f"Assessment failed: {assessment['error']}")
+
+    merged = False
+    if assessment.get("important"):
+        db = SessionLocal()
+        try:
+            _, merged = remember(db, user_id, assessment['fact'], assessment['category'])
+            db.commit()
+        finally:
+            db.close()
+
+    saved = bool(assessment.get("important"))
+    return {
+        "authority_tokens": assessment.get("tokens", 0),
+        "memories_saved": int(saved and not merged),
+        "memories_reinforced": int(saved and merged),
+    }
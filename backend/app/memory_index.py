@@ -0,0 +1,161 @@
+import re
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from .models import ExperienceMemory, ArchivedExperienceMemory
+
+# Inverted index over ExperienceMemory.content
+# SQLite -> FTS5 (BM25), MySQL -> FULLTEXT (InnoDB relevance), anything else -> Python scan.
+FTS_TABLE = "experience_memories_fts"
+MYSQL_FULLTEXT_INDEX = "ix_experience_memories_content_ft"
+
+_backend = "scan"  # Resolved once at startup by configure_memory_index()
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def configure_memory_index(engine):
+    """
+    Picks the search backend for this process from the dialect. No schema checks here:
+    the index itself is created by the migration runner, and a failing query drops to scan.
+    """
+    global _backend
+    _backend = {"sqlite": "fts5", "mysql": "fulltext"}.get(engine.dialect.name, "scan")
+    return _backend
+
+
+def create_memory_index(conn):
+    """
+    Creates (idempotently) the full-text index for the connection's dialect.
+    SQLite keeps it in sync via triggers; MySQL maintains FULLTEXT itself on insert.
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        _create_sqlite_fts(conn)
+    elif dialect == "mysql":
+        _create_mysql_fulltext(conn)
+
+
+def _create_sqlite_fts(conn):
+    exists = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE}
+    ).first()
+    if exists:
+        return
+
+    # 'owner' tags each row with its user so the MATCH itself is user-scoped.
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(content, owner, tokenize='porter unicode61')"
+    ))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS experience_memories_fts_ai AFTER INSERT ON experience_memories BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, content, owner) VALUES (new.id, new.content, 'u' || new.user_id);
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS experience_memories_fts_ad AFTER DELETE ON experience_memories BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END
+    """))
+    conn.execute(text(f"""
+        CREATE TRIGGER IF NOT EXISTS experience_memories_fts_au AFTER UPDATE OF content, user_id ON experience_memories BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+            INSERT INTO {FTS_TABLE}(rowid, content, owner) VALUES (new.id, new.content, 'u' || new.user_id);
+        END
+    """))
+    # Backfill memories written before the index existed
+    conn.execute(text(
+        f"INSERT INTO {FTS_TABLE}(rowid, content, owner) "
+        f"SELECT id, content, 'u' || user_id FROM experience_memories WHERE content IS NOT NULL"
+    ))
+
+
+def _create_mysql_fulltext(conn):
+    exists = conn.execute(text("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = 'experience_memories' AND index_name = :name
+        LIMIT 1
+    """), {"name": MYSQL_FULLTEXT_INDEX}).first()
+    if not exists:
+        conn.execute(text(
+            f"CREATE FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} ON experience_memories (content)"
+        ))
+
+
+def _terms(keywords):
+    """Lowercased, de-duplicated word tokens safe to embed in a MATCH expression."""
+    seen = []
+    for word in keywords:
+        for token in _TOKEN_RE.findall(word.lower()):
+            if token not in seen:
+                seen.append(token)
+    return seen
+
+
+def search_memories(db: Session, user_id: int, keywords, limit: int = 3):
+    """
+    Returns up to `limit` (id, content) rows of the user's hot memories, best match first.
+    Ranking happens inside the database when an index backend is available.
+    """
+    terms = _terms(keywords)
+    if not terms:
+        return []
+
+    global _backend
+    try:
+        if _backend == "fts5":
+            return _search_fts5(db, user_id, terms, limit)
+        if _backend == "fulltext":
+            return _search_mysql(db, user_id, terms, limit)
+    except Exception as e:
+        # Index missing or unsupported here: stop trying it for the rest of the process.
+        print(f"Memory Index Query Error, falling back to scan: {e}")
+        db.rollback()
+        _backend = "scan"
+
+    return _search_scan(db, user_id, keywords, limit)
+
+
+def _search_fts5(db, user_id, terms, limit):
+    match = f'owner : "u{int(user_id)}" AND content : (' + " OR ".join(f'"{t}"' for t in terms) + ")"
+    rows = db.execute(text(f"""
+        SELECT m.id, m.content FROM {FTS_TABLE}
+        JOIN experience_memories m ON m.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH :match
+        ORDER BY bm25({FTS_TABLE}, 1.0, 0.0)
+        LIMIT :limit
+    """), {"match": match, "limit": limit}).all()
+    return [(row.id, row.content) for row in rows]
+
+
+def _search_mysql(db, user_id, terms, limit):
+    rows = db.execute(text("""
+        SELECT id, content, MATCH(content) AGAINST (:q IN NATURAL LANGUAGE MODE) AS score
+        FROM experience_memories
+        WHERE user_id = :user_id AND MATCH(content) AGAINST (:q IN NATURAL LANGUAGE MODE)
+        ORDER BY score DESC
+        LIMIT :limit
+    """), {"q": " ".join(terms), "user_id": user_id, "limit": limit}).all()
+    return [(row.id, row.content) for row in rows]
+
+
+def search_archive(db: Session, user_id: int, keywords, limit: int = 3):
+    """Opt-in deep search over the cold tier (unindexed scan; only runs when asked for)."""
+    if not _terms(keywords):
+        return []
+    return _search_scan(db, user_id, keywords, limit, model=ArchivedExperienceMemory)
+
+
+def _search_scan(db, user_id, keywords, limit, model=ExperienceMemory):
+    """Pure-Python fallback: substring keyword hits over every memory of the user."""
+    memories = db.query(model.id, model.content).filter(model.user_id == user_id)
+
+    results = []
+    for memory_id, content in memories:
+        lowered = (content or "").lower()
+        matches = sum(1 for word in keywords if word.lower() in lowered)
+        if matches > 0:
+            results.append((memory_id, content, matches))
+
+    results.sort(key=lambda x: x[2], reverse=True)
+    return [(memory_id, content) for memory_id, content, _ in results[:limit]]
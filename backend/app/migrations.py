@@ -0,0 +1,141 @@
+from datetime import datetime
+from sqlalchemy import inspect, text
+from .database import Base
+from .models import StreamLog, ExperienceMemory, DomainMemory, JobLease, StreamChunkSummary, ArchivedExperienceMemory
+from .memory_index import create_memory_index
+from .memory_dedup import content_hash, simhash
+
+# Versioned schema migrations
+# Each step is idempotent (it checks before it alters), so a fresh database built by
+# create_all and an old one patched step by step converge on the same schema.
+SCHEMA_VERSION_TABLE = "schema_version"
+
+
+def _add_column(conn, table, column, ddl_type):
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in existing:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+
+
+def _create_index(conn, model, name):
+    existing = {i["name"] for i in inspect(conn).get_indexes(model.__tablename__)}
+    if name in existing:
+        return
+    for index in model.__table__.indexes:
+        if index.name == name:
+            index.create(conn)
+
+
+def _m1_password_hash(conn):
+    _add_column(conn, "users", "password_hash", "VARCHAR(255)")
+
+
+def _m2_stream_token_counts(conn):
+    _add_column(conn, "users", "stream_tokens", "INTEGER")
+    _add_column(conn, "stream_logs", "token_count", "INTEGER")
+
+
+def _m3_memory_fulltext(conn):
+    try:
+        create_memory_index(conn)
+    except Exception as e:
+        # Optional: retrieval falls back to the Python scan without it.
+        print(f"Memory Index Migration skipped: {e}")
+
+
+def _m4_composite_indexes(conn):
+    _create_index(conn, StreamLog, "ix_stream_logs_user_timestamp")
+    _create_index(conn, ExperienceMemory, "ix_experience_memories_user_category_created")
+
+    # The unique (user_id, key) index needs duplicate facts collapsed first; the newest row wins.
+    key = conn.dialect.identifier_preparer.quote("key")
+    conn.execute(text(f"""
+        DELETE FROM domain_memories WHERE id NOT IN (
+            SELECT id FROM (SELECT MAX(id) AS id FROM domain_memories GROUP BY user_id, {key}) AS keep
+        )
+    """))
+    _create_index(conn, DomainMemory, "uq_domain_memories_user_key")
+
+
+def _m5_job_leases(conn):
+    JobLease.__table__.create(conn, checkfirst=True)
+
+
+def _m6_stream_chunk_summaries(conn):
+    StreamChunkSummary.__table__.create(conn, checkfirst=True)
+
+
+def _m7_memory_dedup(conn):
+    _add_column(conn, "experience_memories", "content_hash", "VARCHAR(32)")
+    _add_column(conn, "experience_memories", "simhash", "BIGINT")
+    _add_column(conn, "experience_memories", "reinforcement_count", "INTEGER DEFAULT 1")
+    _add_column(conn, "experience_memories", "last_reinforced_at", "DATETIME")
+    _create_index(conn, ExperienceMemory, "ix_experience_memories_user_hash")
+
+    # Fingerprint existing memories so new writes can merge into them
+    rows = conn.execute(text("SELECT id, content FROM experience_memories WHERE content_hash IS NULL")).all()
+    for row in rows:
+        conn.execute(
+            text("UPDATE experience_memories SET content_hash = :h, simhash = :s, "
+                 "reinforcement_count = COALESCE(reinforcement_count, 1) WHERE id = :id"),
+            {"h": content_hash(row.content), "s": simhash(row.content), "id": row.id}
+        )
+
+
+def _m8_memory_tiers(conn):
+    _add_column(conn, "experience_memories", "retrieval_hits", "INTEGER DEFAULT 0")
+    _add_column(conn, "experience_memories", "last_retrieved_at", "DATETIME")
+    ArchivedExperienceMemory.__table__.create(conn, checkfirst=True)
+
+
+MIGRATIONS = [
+    (1, "users.password_hash", _m1_password_hash),
+    (2, "stream token counts", _m2_stream_token_counts),
+    (3, "experience memory full-text index", _m3_memory_fulltext),
+    (4, "composite indexes for hot queries", _m4_composite_indexes),
+    (5, "job leases", _m5_job_leases),
+    (6, "stream chunk summaries", _m6_stream_chunk_summaries),
+    (7, "experience memory dedup fingerprints", _m7_memory_dedup),
+    (8, "experience memory decay + archive tier", _m8_memory_tiers),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def _current_version(conn):
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} "
+        f"(version INTEGER PRIMARY KEY, description VARCHAR(255), applied_at DATETIME)"
+    ))
+    return conn.execute(text(f"SELECT MAX(version) FROM {SCHEMA_VERSION_TABLE}")).scalar() or 0
+
+
+def run_migrations(engine):
+    """
+    Brings the schema to LATEST_VERSION. Once it is current, startup costs one
+    SELECT MAX(version) and skips table creation and every column/index check.
+    """
+    with engine.begin() as conn:
+        version = _current_version(conn)
+    if version >= LATEST_VERSION:
+        return version
+
+    # Tables that do not exist yet are created with the current model (columns + indexes)
+    Base.metadata.create_all(bind=engine)
+
+    for number, description, step in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            with engine.begin() as conn:
+                step(conn)
+                conn.execute(
+                    text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (version, description, applied_at) VALUES (:v, :d, :t)"),
+                    {"v": number, "d": description, "t": datetime.utcnow()}
+                )
+            print(f"Schema migrated to v{number}: {description}")
+            version = number
+        except Exception as e:
+            # Later steps may depend on this one; stop and retry on next startup.
+            print(f"Migration v{number} ({description}) failed: {e}")
+            break
+    return version
@@ -0,0 +1,125 @@
+import os
+import threading
+import time
+from collections import deque
+from .workers import latency_percentiles
+
+# Configuration — Model routing (27B -> 4B degradation)
+LATENCY_BUDGET_MS = float(os.getenv("LATENCY_BUDGET_MS", "8000"))  # p95 above this degrades non-critical calls
+BREAKER_LATENCY_FACTOR = 2.0       # p95 above budget x this moves chat too
+DEGRADE_ERROR_RATE = 0.2           # Error rate that degrades non-critical calls
+BREAKER_ERROR_RATE = 0.5           # Error rate that opens the breaker (chat degrades too)
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # Seconds open before a probe
+ROUTER_WINDOW = 50                 # Recent calls per model considered
+ROUTER_WINDOW_SECONDS = 300        # ... and only if they are this recent
+MIN_SAMPLES = 10                   # No verdicts on less evidence than this
+
+# Lane priorities as in llm_scheduler (0 = chat is the critical one)
+_CHAT_PRIORITY = 0
+
+
+class ModelRouter:
+    """
+    Picks the model for each call from the primary model's rolling p95 latency and error rate.
+    healthy -> everything on 27B; degraded -> non-critical calls (retrieval gate, assessment) on 4B;
+    open breaker -> chat on 4B too, until a half-open probe to 27B succeeds.
+    """
+
+    def __init__(self, primary: str, fallback: str):
+        self.primary = primary
+        self.fallback = fallback
+        self._samples = {}  # model -> deque of (finished_at, seconds, ok)
+        self._lock = threading.Lock()
+        self._breaker = "closed"
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+        self._counters = {"routed_primary": 0, "routed_fallback": 0, "breaker_trips": 0, "probes": 0}
+
+    def route(self, priority: int, preferred: str = None):
+        """Model for a call in lane `priority`; `preferred` defaults to the primary model."""
+        preferred = preferred or self.primary
+        if preferred != self.primary:
+            return preferred
+        with self._lock:
+            state = self._state_locked()
+            probe_lost = time.monotonic() - self._probe_started > BREAKER_COOLDOWN  # e.g. it never left the queue
+            if state == "half_open" and (not self._probe_in_flight or probe_lost):
+                # One live call tests whether the primary has recovered
+                self._probe_in_flight = True
+                self._probe_started = time.monotonic()
+                self._counters["probes"] += 1
+                model = self.primary
+            elif state in ("open", "half_open"):
+                model = self.fallback
+            elif state == "degraded" and priority != _CHAT_PRIORITY:
+                model = self.fallback
+            else:
+                model = self.primary
+            self._counters["routed_primary" if model == self.primary else "routed_fallback"] += 1
+            return model
+
+    def observe(self, model: str, seconds: float, ok: bool):
+        """Records one finished call (latency + outcome) and moves the breaker accordingly."""
+        now = time.monotonic()
+        with self._lock:
+            samples = self._samples.setdefault(model, deque(maxlen=ROUTER_WINDOW))
+            samples.append((now, seconds, ok))
+            if model != self.primary:
+                return
+
+            if self._breaker == "open" and self._probe_in_flight:
+                self._probe_in_flight = False
+                if ok and seconds * 1000 <= LATENCY_BUDGET_MS * BREAKER_LATENCY_FACTOR:
+                    # Recovered: close and start the window afresh
+                    self._breaker = "closed"
+                    samples.clear()
+                else:
+                    self._opened_at = now
+                return
+
+            if self._breaker == "closed":
+                p95, error_rate, count = self._health_locked(model, now)
+                if count >= MIN_SAMPLES and (
+                    error_rate >= BREAKER_ERROR_RATE or p95 * 1000 > LATENCY_BUDGET_MS * BREAKER_LATENCY_FACTOR
+                ):
+                    self._breaker = "open"
+                    self._opened_at = now
+                    self._counters["breaker_trips"] += 1
+                    print(f"Model Router: breaker OPEN for {model} (p95 {p95 * 1000:.0f}ms, errors {error_rate:.0%})")
+
+    def _health_locked(self, model, now):
+        recent = [(s, ok) for t, s, ok in self._samples.get(model, ()) if now - t <= ROUTER_WINDOW_SECONDS]
+        if not recent:
+            return 0.0, 0.0, 0
+        latencies = sorted(s for s, _ in recent)
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+        error_rate = sum(1 for _, ok in recent if not ok) / len(recent)
+        return p95, error_rate, len(recent)
+
+    def _state_locked(self):
+        now = time.monotonic()
+        if self._breaker == "open":
+            return "half_open" if now - self._opened_at >= BREAKER_COOLDOWN else "open"
+        p95, error_rate, count = self._health_locked(self.primary, now)
+        if count >= MIN_SAMPLES and (error_rate >= DEGRADE_ERROR_RATE or p95 * 1000 > LATENCY_BUDGET_MS):
+            return "degraded"
+        return "healthy"
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            models = {}
+            for model, samples in self._samples.items():
+                p95, error_rate, count = self._health_locked(model, now)
+                models[model] = {
+                    "samples": count,
+                    "error_rate": round(error_rate, 3),
+                    "latency_ms": latency_percentiles(sorted(s for t, s, _ in samples if now - t <= ROUTER_WINDOW_SECONDS)),
+                }
+            return {
+                "state": self._state_locked(),
+                "latency_budget_ms": LATENCY_BUDGET_MS,
+                **self._counters,
+                "models": models,
+            }
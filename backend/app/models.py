@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, BigInteger, Float, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .database import Base
@@ -10,6 +10,7 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     email = Column(String, unique=True, index=True)
     password_hash = Column(String)
+    stream_tokens = Column(Integer, nullable=True)  # Running Stream total; NULL = recount on next read
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Relationships
@@ -25,9 +26,20 @@ class ExperienceMemory(Base):
     content = Column(Text)  # The summarized fact/pattern
     category = Column(String) # e.g., 'preference', 'fact', 'pattern'
     created_at = Column(DateTime, default=datetime.utcnow)
+    content_hash = Column(String(32), nullable=True)   # Normalized-text hash (exact dedup)
+    simhash = Column(BigInteger, nullable=True)        # 64-bit SimHash (near-duplicate dedup)
+    reinforcement_count = Column(Integer, default=1)   # Times this memory was written again
+    last_reinforced_at = Column(DateTime, nullable=True)
+    retrieval_hits = Column(Integer, default=0)        # Times this memory was put into a prompt
+    last_retrieved_at = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="memories")
 
+    __table_args__ = (
+        Index("ix_experience_memories_user_category_created", "user_id", "category", "created_at"),
+        Index("ix_experience_memories_user_hash", "user_id", "content_hash"),
+    )
+
 class StreamLog(Base):
     """The raw conversation stream (The 'Stream' from mk3.txt)"""
     __tablename__ = "stream_logs"
@@ -36,10 +48,15 @@ class StreamLog(Base):
     user_id = Column(Integer, ForeignKey("users.id"))
     role = Column(String) # 'user' or 'lux'
     content = Column(Text)
+    token_count = Column(Integer, default=0)  # Estimated at insert so capacity checks never rescan
     timestamp = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User", back_populates="streams")
 
+    __table_args__ = (
+        Index("ix_stream_logs_user_timestamp", "user_id", "timestamp"),
+    )
+
 class DomainMemory(Base):
     """Structured data for Lux's job (Leads, State, User Profile from mk3.txt)"""
     __tablename__ = "domain_memories"
@@ -51,3 +68,46 @@ class DomainMemory(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User")
+
+    __table_args__ = (
+        Index("uq_domain_memories_user_key", "user_id", "key", unique=True),
+    )
+
+class JobLease(Base):
+    """Cross-process lease on a named background job (e.g. one Memory Keep per user at a time)"""
+    __tablename__ = "job_leases"
+
+    name = Column(String(100), primary_key=True)  # e.g., 'memory_keep:42'
+    owner = Column(String(64))                    # Token of the holder; only it may release
+    expires_at = Column(DateTime)                 # A crashed holder's lease lapses here
+
+class StreamChunkSummary(Base):
+    """Rolling 4B summary of a closed chunk of the Stream, precomputed ahead of the Memory Keep"""
+    __tablename__ = "stream_chunk_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"))
+    first_id = Column(Integer)  # StreamLog id range covered by this chunk
+    last_id = Column(Integer)
+    summary = Column(Text)      # Rolling summary: everything up to last_id, not just this chunk
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_stream_chunk_summaries_user_last", "user_id", "last_id"),
+    )
+
+class ArchivedExperienceMemory(Base):
+    """Cold tier: Experience Memories compacted out of the hot table (searched only on request)"""
+    __tablename__ = "experience_memory_archive"
+
+    id = Column(Integer, primary_key=True, index=True)
+    memory_id = Column(Integer)  # Id it had in experience_memories (SQLite may reuse it later)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    content = Column(Text)
+    category = Column(String)
+    created_at = Column(DateTime)
+    reinforcement_count = Column(Integer, default=1)
+    retrieval_hits = Column(Integer, default=0)
+    score = Column(Float)                      # Decay score at the time it was archived
+    merged_into = Column(Integer, nullable=True)  # Hot memory that absorbed it, if merged
+    archived_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,81 @@
+import os
+import re
+import threading
+import time
+from .gemma_client import estimate_tokens
+
+# Configuration — Static Prompt Prefix (Core Memory + Directives)
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config")
+DIRECTIVES_TOKEN_LIMIT = int(os.getenv("DIRECTIVES_TOKEN_LIMIT", "512"))  # mk3: Directives are strictly size-limited
+RELOAD_CHECK_INTERVAL = 2.0  # Seconds between mtime checks for hot reload
+
+
+class PromptPrefixCache:
+    """
+    Core Memory and Directives held in memory and hot-reloaded when the files change.
+    The size rule and token measurement happen once per load, never per request.
+    """
+
+    def __init__(self, config_dir: str = CONFIG_DIR):
+        self.config_dir = config_dir
+        self._lock = threading.Lock()
+        self._mtimes = None
+        self._checked_at = 0.0
+        self._messages = []
+        self.token_count = 0
+
+    def messages(self):
+        """The two system messages that open every prompt (fresh list, shared strings)."""
+        self._refresh_if_stale()
+        return [dict(message) for message in self._messages]
+
+    def tokens(self):
+        self._refresh_if_stale()
+        return self.token_count
+
+    def _refresh_if_stale(self):
+        now = time.monotonic()
+        if self._mtimes is not None and now - self._checked_at < RELOAD_CHECK_INTERVAL:
+            return
+        with self._lock:
+            self._checked_at = now
+            mtimes = tuple(self._mtime(name) for name in ("core_memory.txt", "directives.txt"))
+            if mtimes != self._mtimes:
+                self._load()
+                self._mtimes = mtimes
+
+    def _mtime(self, filename):
+        try:
+            return os.stat(os.path.join(self.config_dir, filename)).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(self.config_dir, filename), 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception as e:
+            print(f"Error reading config {filename}: {e}")
+            return f"[Error loading {filename}]"
+
+    def _load(self):
+        core = self._read("core_memory.txt")
+        directives = self._read("directives.txt")
+
+        # Enforce the Directives size limit once, at load time
+        if estimate_tokens(directives) > DIRECTIVES_TOKEN_LIMIT:
+            keep = int(DIRECTIVES_TOKEN_LIMIT / 1.3)
+            print(f"Directives exceed {DIRECTIVES_TOKEN_LIMIT} tokens; truncating to the first {keep} words.")
+            # Cut the original text after the keep-th word, so newlines and list markers survive
+            ends = [m.end() for m in re.finditer(r"\S+", directives)]
+            directives = directives[:ends[keep - 1]] if keep > 0 else ""
+
+        self._messages = [
+            {"role": "system", "content": core},
+            {"role": "system", "content": directives},
+        ]
+        self.token_count = estimate_tokens(core) + estimate_tokens(directives)
+
+
+# Process-wide prefix shared by every MemoryKeepEngine.
+prompt_prefix = PromptPrefixCache()
@@ -1,19 +1,21 @@
+from typing import Optional
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from .models import ExperienceMemory
-from .gemma_client import generate_response
+from .gemma_client import generate_response, generate_response_async
+from .llm_scheduler import PRIORITY_RETRIEVAL
+from .memory_index import search_memories, search_archive
+from .memory_compaction import record_retrieval_hits
+from . import vector_index
+from .workers import intake_queue, submit_or_defer, run_deferred
+from .retrieval_gate import retrieval_gate
 import json
 
-class RetrievalEngine:
-    def __init__(self, db: Session, user_id: int):
-        self.db = db
-        self.user_id = user_id
+SEMANTIC_MIN_SCORE = 0.15  # Cosine floor for semantic hits (mk3 6.4 confidence filter)
 
-    def generate_search_query(self, user_message: str):
-        """
-        Lux (27B) autonomously decides if she needs to search her history.
-        """
-        prompt = [
-            {"role": "system", "content": """
+def _search_decision_prompt(user_message: str):
+    return [
+        {"role": "system", "content": """
 [ROLE: AUTONOMOUS RETRIEVAL AUTHORITY]
 You are Lux. Look at the user message. 
 Do you need to search your Experience Memory (past snippets/facts) to respond accurately or maintain continuity?
@@ -25,70 +27,162 @@ Output in JSON:
   "reason": "brief internal monologue for why you are pulling this memory"
 }
 """},
-            {"role": "user", "content": f"User Message: {user_message}"}
-        ]
-        
-        try:
-            response_text = generate_response(prompt).strip()
-            # Extract JSON
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            if start != -1 and end != 0:
-                decision = json.loads(response_text[start:end])
-                if decision.get("needs_search"):
-                    return decision.get("search_query")
-        except Exception as e:
-            print(f"Retrieval Decision Error: {e}")
-            
-        return None
+        {"role": "user", "content": f"User Message: {user_message}"}
+    ]
+
+def _parse_search_decision(response_text: str):
+    """Returns the search query from the 27B decision, or None."""
+    response_text = response_text.strip()
+    # Extract JSON
+    start = response_text.find('{')
+    end = response_text.rfind('}') + 1
+    if start != -1 and end != 0:
+        decision = json.loads(response_text[start:end])
+        if decision.get("needs_search"):
+            return decision.get("search_query")
+    return None
+
+def _format_snippets(memories):
+    if not memories:
+        return ""
+    return "\n[PAST EXPERIENCE MEMORY]:\n" + "\n".join([f"- {m}" for m in memories])
 
-    def retrieve_relevant_memories(self, query: str, limit: int = 3):
+def _confident(candidates, keywords):
+    """Discards low-confidence keyword results (mk3 6.4): 2+ hits or half the query words."""
+    refined_results = []
+    for memory_id, content in candidates:
+        lowered = content.lower()
+        score = sum(1 for word in keywords if word.lower() in lowered)
+        confidence = score / len(keywords) if keywords else 0
+        if score >= 2 or confidence >= 0.5:
+            refined_results.append((memory_id, content))
+    return refined_results
+
+def _query_from_decision(user_message: str, decision: dict):
+    return (decision.get("search_query") or user_message) if decision.get("needs_search") else None
+
+class RetrievalEngine:
+    def __init__(self, db: Session, user_id: int, deferred_jobs: Optional[list] = None):
+        self.db = db
+        self.user_id = user_id
+        self.deferred_jobs = deferred_jobs  # See submit_or_defer (async path)
+
+    def generate_search_query(self, user_message: str):
+        """
+        Decides if Lux needs to search her history: local gate first, 27B only when uncertain.
+        """
+        return retrieval_gate.decide(user_message, self._llm_search_query)
+
+    def _llm_search_query(self, user_message: str):
+        """
+        Lux (27B) autonomously decides if she needs to search her history.
+        Errors propagate, so the gate can tell a failed call from a "no search" verdict.
+        """
+        return _parse_search_decision(generate_response(
+            _search_decision_prompt(user_message), priority=PRIORITY_RETRIEVAL, user_id=self.user_id
+        ))
+
+    def retrieve_relevant_memories(self, query: str, limit: int = 3, deep: bool = False):
         """
         Searches ExperienceMemory for content matching the query.
+        `deep` also digs into the archived (cold) tier when the hot one comes up short.
         """
         if not query:
             return []
             
-        # Simple keyword search on content
+        # 1. Optional semantic mode: cosine top-k over precomputed embeddings
+        results = None
+        if vector_index.SEMANTIC_ENABLED:
+            results = self.retrieve_semantic_memories(query, limit=limit)
+
+        # 2. Ranked top-k from the full-text index (FTS5 / FULLTEXT / scan fallback)
         keywords = query.split()
-        memories = self.db.query(ExperienceMemory).filter(
-            ExperienceMemory.user_id == self.user_id
-        )
-        
-        results = []
-        for mem in memories.all():
-            # Basic relevance score based on keyword matches
-            matches = sum(1 for word in keywords if word.lower() in mem.content.lower())
-            if matches > 0:
-                results.append((mem.content, matches))
-        
-        # 3. Relevance Re-ranking (Sort by matches descending)
-        results.sort(key=lambda x: x[1], reverse=True)
-        
-        # 4. Discard low-confidence results (mk3 6.4)
-        refined_results = []
-        count = 0
-        for item in results:
-            if count >= limit:
-                break
-            content, score = item
-            confidence = score / len(keywords) if keywords else 0
-            if score >= 2 or confidence >= 0.5:
-                refined_results.append(content)
-            count += 1
-                
-        return refined_results
-
-    def get_memories_for_prompt(self, user_message: str):
+        if results is None:
+            results = _confident(search_memories(self.db, self.user_id, keywords, limit=limit), keywords)
+
+        # Retrieval hits feed the decay score (bookkeeping, off the request path)
+        if results:
+            submit_or_defer(intake_queue, self.deferred_jobs, record_retrieval_hits, [memory_id for memory_id, _ in results])
+
+        # 3. Opt-in deep search over the archive
+        if deep and len(results) < limit:
+            archived = search_archive(self.db, self.user_id, keywords, limit=limit - len(results))
+            results = results + _confident(archived, keywords)
+
+        return [content for _, content in results]
+
+    def retrieve_semantic_memories(self, query: str, limit: int = 3):
+        """
+        Paraphrase-tolerant search over the user's vector matrix, as (id, content) rows.
+        Returns None when the user has no matrix yet (backfill is queued; keyword search covers this turn).
+        """
+        if not vector_index.has_vectors(self.user_id):
+            submit_or_defer(intake_queue, self.deferred_jobs, vector_index.backfill_user, self.user_id)
+            return None
+
+        hits = vector_index.search(self.user_id, query, k=limit * 2)
+        scores = {}
+        for memory_id, score in hits:
+            if score >= SEMANTIC_MIN_SCORE and memory_id not in scores:
+                scores[memory_id] = score
+        if not scores:
+            return []
+
+        # Rows deleted (or archived) since they were embedded simply drop out here.
+        rows = self.db.query(ExperienceMemory.id, ExperienceMemory.content).filter(
+            ExperienceMemory.user_id == self.user_id,
+            ExperienceMemory.id.in_(list(scores))
+        ).all()
+        rows.sort(key=lambda row: scores[row.id], reverse=True)
+        return [(row.id, row.content) for row in rows[:limit]]
+
+    def get_memories_for_prompt(self, user_message: str, decision: Optional[dict] = None, deep: bool = False):
         """
         Final high-level call for the MemoryEngine.
+        A fused turn-analysis `decision` ({needs_search, search_query}) replaces the gate.
         """
-        query = self.generate_search_query(user_message)
+        if decision is not None:
+            query = _query_from_decision(user_message, decision)
+        else:
+            query = self.generate_search_query(user_message)
         if not query:
             return ""
             
-        memories = self.retrieve_relevant_memories(query)
-        if not memories:
+        return _format_snippets(self.retrieve_relevant_memories(query, deep=deep))
+
+
+class AsyncRetrievalEngine:
+    """
+    Awaitable RetrievalEngine: the gate's LLM fallback is a native async Gemma call,
+    and the (index-backed) search reuses the sync engine through run_sync.
+    """
+
+    def __init__(self, db: AsyncSession, user_id: int):
+        self.db = db
+        self.user_id = user_id
+
+    async def generate_search_query(self, user_message: str):
+        return await retrieval_gate.decide_async(user_message, self._llm_search_query)
+
+    async def _llm_search_query(self, user_message: str):
+        return _parse_search_decision(await generate_response_async(
+            _search_decision_prompt(user_message), priority=PRIORITY_RETRIEVAL, user_id=self.user_id
+        ))
+
+    async def retrieve_relevant_memories(self, query: str, limit: int = 3, deep: bool = False):
+        deferred = []
+        results = await self.db.run_sync(
+            lambda s: RetrievalEngine(s, self.user_id, deferred).retrieve_relevant_memories(query, limit=limit, deep=deep)
+        )
+        await run_deferred(deferred)
+        return results
+
+    async def get_memories_for_prompt(self, user_message: str, decision: Optional[dict] = None, deep: bool = False):
+        if decision is not None:
+            query = _query_from_decision(user_message, decision)
+        else:
+            query = await self.generate_search_query(user_message)
+        if not query:
             return ""
-            
-        return "\n[PAST EXPERIENCE MEMORY]:\n" + "\n".join([f"- {m}" for m in memories])
+
+        return _format_snippets(await self.retrieve_relevant_memories(query, deep=deep))
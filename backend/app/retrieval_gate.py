@@ -0,0 +1,150 @@
+import re
+import threading
+from collections import OrderedDict
+
+# Configuration — Retrieval Gate
+GATE_CACHE_SIZE = 4096  # Normalized messages whose search decision is remembered
+MAX_TRIVIAL_WORDS = 4   # Longer messages are never waved through as small talk
+
+_WORD_RE = re.compile(r"[a-z0-9']+")
+
+# Small talk that never needs Experience Memory.
+TRIVIAL_WORDS = {
+    "hi", "hello", "hey", "yo", "sup", "hiya", "howdy", "thanks", "thank", "thx", "ty", "you",
+    "ok", "okay", "k", "kk", "lol", "lmao", "haha", "hahaha", "yes", "yeah", "yep", "yup", "no",
+    "nope", "nah", "sure", "cool", "nice", "great", "awesome", "bye", "goodbye", "cya", "good",
+    "morning", "night", "evening", "afternoon", "hmm", "hm", "oh", "ah", "wow", "alright", "np",
+}
+
+# Words that carry no search signal on their own.
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "if", "of", "to", "in", "on", "at", "for", "with", "is",
+    "are", "was", "were", "be", "been", "am", "do", "does", "did", "i", "me", "you", "we", "it",
+    "that", "this", "what", "what's", "whats", "who", "how", "when", "where", "why", "can", "could",
+    "would", "should", "will", "about", "my", "your", "again", "remember", "recall", "tell", "know",
+    "said", "told", "mentioned", "last", "time", "earlier", "before", "previously", "please",
+}
+
+# Explicit references to shared history: always search.
+RECALL_CUES = re.compile(
+    r"\b(remember|recall|last time|earlier|before|previously|again|you said|i said|i told you|"
+    r"i mentioned|we talked|we discussed|my (name|wife|husband|son|daughter|kid|kids|dog|cat|job|birthday)|"
+    r"what('s| is) my|do you know (my|who|what))\b"
+)
+
+
+def normalize(message: str) -> str:
+    """Lowercase word tokens only, so "Hi!!" and "hi" share a cache entry."""
+    return " ".join(_WORD_RE.findall((message or "").lower()))
+
+
+class RetrievalGate:
+    """
+    Tiered decision on whether a message needs an Experience Memory search:
+    local heuristics first, then an LRU of earlier verdicts, and only then the LLM.
+    """
+
+    def __init__(self, cache_size: int = GATE_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"heuristic_skip": 0, "heuristic_search": 0, "cache_hits": 0, "llm_fallbacks": 0,
+                          "llm_errors": 0}
+
+    def decide(self, message: str, llm_decide):
+        """
+        Returns the search query, or None when no search is needed.
+        `llm_decide(message)` is only called when the local tiers are uncertain;
+        a call that raises means "no search this time" and is not cached.
+        """
+        key, hit, query = self._local(message)
+        if hit:
+            return query
+
+        # 3. LLM tier
+        self._count("llm_fallbacks")
+        try:
+            query = llm_decide(message)
+        except Exception as e:
+            self._llm_failed(e)
+            return None
+        self._remember(key, query)
+        return query
+
+    async def decide_async(self, message: str, llm_decide_async):
+        """Awaitable decide(); `llm_decide_async(message)` is a coroutine function."""
+        key, hit, query = self._local(message)
+        if hit:
+            return query
+
+        self._count("llm_fallbacks")
+        try:
+            query = await llm_decide_async(message)
+        except Exception as e:
+            self._llm_failed(e)
+            return None
+        self._remember(key, query)
+        return query
+
+    def _local(self, message: str):
+        """Heuristic and cache tiers. Returns (normalized key, decided?, query)."""
+        key = normalize(message)
+
+        # 1. Heuristic tier (confident cases only)
+        verdict = self._heuristic(key)
+        if verdict is not None:
+            needs_search, query = verdict
+            self._count("heuristic_search" if needs_search else "heuristic_skip")
+            return key, True, query
+
+        # 2. Cache tier
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._counters["cache_hits"] += 1
+                return key, True, self._cache[key]
+        return key, False, None
+
+    def _llm_failed(self, error: Exception):
+        # A transient outage must not switch off memory search for this message until eviction
+        print(f"Retrieval Decision Error: {error}")
+        self._count("llm_errors")
+
+    def _remember(self, key: str, query):
+        with self._lock:
+            self._cache[key] = query
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _heuristic(self, key: str):
+        words = key.split()
+        if not words:
+            return (False, None)  # Emoji / punctuation only
+        if len(words) <= MAX_TRIVIAL_WORDS and all(w in TRIVIAL_WORDS for w in words):
+            return (False, None)
+        if RECALL_CUES.search(key):
+            terms = [w for w in words if w not in STOPWORDS and len(w) > 2]
+            if terms:
+                return (True, " ".join(terms))
+        return None
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            # llm_errors is a subset of llm_fallbacks, not a decision of its own
+            decided = sum(v for k, v in self._counters.items() if k != "llm_errors")
+            local = decided - self._counters["llm_fallbacks"]
+            return {
+                **self._counters,
+                "decisions": decided,
+                "local_rate": round(local / decided, 3) if decided else 0.0,
+                "cache_size": len(self._cache),
+            }
+
+
+# Process-wide gate shared by every RetrievalEngine.
+retrieval_gate = RetrievalGate()
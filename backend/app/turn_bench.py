@@ -0,0 +1,79 @@
+"""
+Offline full-turn benchmark: concurrent simulated users chatting with the app in-process,
+against the fake provider (or a fake_llm_server over HTTP) and a throwaway SQLite database.
+Run from backend/:  python -m app.turn_bench --users 8 --turns 10
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+MESSAGES = [
+    "hi Lux",
+    "my name is Sam and I love trail running",
+    "what do you think about the revolution?",
+    "I prefer short answers in the morning",
+    "do you remember what I like to do on weekends?",
+    "ok thanks",
+    "my sister lives in Lisbon",
+    "where does my sister live?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--stream", action="store_true", help="Use /chat/stream instead of /chat")
+    args = parser.parse_args()
+
+    # Settings must be in place before the app modules read them at import time
+    os.environ.setdefault("LLM_PROVIDER", "fake")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='lux-bench-')}/bench.db")
+    os.environ.setdefault("LLM_RPM", "0")
+    os.environ.setdefault("LLM_TPM", "0")
+
+    from fastapi.testclient import TestClient
+    from .main import app
+    from .workers import latency_percentiles
+
+    with TestClient(app) as client:
+        user_ids = [
+            client.post("/api/auth/signup", json={"email": f"bench{i}@lux.local", "password": "bench"}).json()["user_id"]
+            for i in range(args.users)
+        ]
+
+        def run_user(index):
+            latencies, failures = [], 0
+            for turn in range(args.turns):
+                payload = {"user_id": user_ids[index], "message": MESSAGES[(index + turn) % len(MESSAGES)]}
+                started = time.perf_counter()
+                if args.stream:
+                    with client.stream("POST", "/api/chat/stream", json=payload) as response:
+                        ok = response.status_code == 200 and not any(
+                            line.startswith("event: error") for line in response.iter_lines()
+                        )
+                else:
+                    ok = client.post("/api/chat", json=payload).status_code == 200
+                latencies.append(time.perf_counter() - started)
+                failures += not ok
+            return latencies, failures
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users) as pool:
+            results = list(pool.map(run_user, range(args.users)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(s for user_latencies, _ in results for s in user_latencies)
+        print(f"Turns: {len(latencies)} in {elapsed:.1f}s ({len(latencies) / elapsed:.1f}/s), "
+              f"failed: {sum(f for _, f in results)}")
+        print(f"Turn latency (ms): {latency_percentiles(latencies)}")
+        print(f"Stages (ms): {client.get('/api/turn/stats').json()}")
+        print(f"Scheduler: {client.get('/api/llm/scheduler').json()}")
+        print(f"Router: {client.get('/api/llm/router').json()}")
+        print(f"Provider: {client.get('/api/llm/pool').json()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from .workers import LATENCY_WINDOW, latency_percentiles
+
+# Configuration — Per-Turn Fan-Out
+TURN_WORKERS = int(os.getenv("TURN_WORKERS", "16"))  # Shared across all in-flight turns
+
+_executor = ThreadPoolExecutor(max_workers=TURN_WORKERS, thread_name_prefix="turn")
+_stage_samples = {}
+_samples_lock = threading.Lock()
+
+
+class TurnPipeline:
+    """
+    A chat turn as a small dependency graph. Concurrent stages run on the shared pool as soon as
+    the stages they depend on have finished, so wall-clock time tracks the critical path;
+    a stage with no concurrent siblings runs on the calling thread.
+    """
+
+    def __init__(self):
+        self._stages = {}
+        self.timings = {}
+
+    def stage(self, name: str, fn, after=()):
+        """Registers `fn(results)`; `results` maps finished stage names to their return values."""
+        self._stages[name] = (fn, tuple(after))
+        return self
+
+    def run(self):
+        started = time.perf_counter()
+        results = {}
+        pending = dict(self._stages)
+        running = {}
+
+        while pending or running:
+            ready = [name for name, (_, after) in pending.items() if all(dep in results for dep in after)]
+            if not ready and not running:
+                raise RuntimeError(f"Unsatisfiable turn stages: {sorted(pending)}")
+
+            # 1. A lone stage (e.g. the generate -> reply_intake -> stats chain) runs on the calling
+            #    thread: a pool thread held through a Gemma call would stall other turns' fan-out
+            if len(ready) == 1 and not running:
+                name = ready[0]
+                results[name] = self._timed(name, pending.pop(name)[0], results)
+                continue
+
+            # 2. Fan-out: launch every stage whose dependencies are satisfied
+            for name in ready:
+                fn, _ = pending.pop(name)
+                running[_executor.submit(self._timed, name, fn, results)] = name
+
+            # 3. Collect whatever finished first; a failing stage fails the turn
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name] = future.result()
+
+        self.timings["total"] = round((time.perf_counter() - started) * 1000, 1)
+        record_timings(self.timings)
+        return results
+
+    def _timed(self, name, fn, results):
+        stage_started = time.perf_counter()
+        try:
+            return fn(results)
+        finally:
+            self.timings[name] = round((time.perf_counter() - stage_started) * 1000, 1)
+
+
+def record_timings(timings):
+    with _samples_lock:
+        for name, ms in timings.items():
+            _stage_samples.setdefault(name, deque(maxlen=LATENCY_WINDOW)).append(ms / 1000)
+
+
+def stage_stats():
+    """Rolling per-stage latency percentiles (milliseconds) across recent turns."""
+    with _samples_lock:
+        return {name: latency_percentiles(sorted(samples)) for name, samples in _stage_samples.items()}
@@ -0,0 +1,216 @@
+import os
+import hashlib
+import re
+import threading
+from functools import lru_cache
+from sqlalchemy import event
+from .database import SessionLocal, DATA_DIR
+from .models import ExperienceMemory
+
+try:
+    import numpy as np
+except ImportError:  # Semantic mode is optional; keyword retrieval keeps working without it.
+    np = None
+
+# Configuration — Semantic Experience Retrieval
+EMBED_DIM = 512  # Hashing embedder width (2 KB per memory on disk)
+VECTOR_DIR = os.getenv("VECTOR_DIR", os.path.join(DATA_DIR, "vectors"))
+ANN_THRESHOLD = 20000  # Rows per user before the approximate (LSH) index kicks in
+LSH_TABLES = 8
+LSH_BITS = 12
+SEMANTIC_ENABLED = os.getenv("RETRIEVAL_MODE", "keyword").strip().lower() == "semantic" and np is not None
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_locks = {}
+_locks_guard = threading.Lock()
+_ann_cache = {}
+
+
+@lru_cache(maxsize=200000)
+def _slot(feature: str):
+    """Stable (process-independent) hash of a feature to a column and a sign."""
+    digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "little")
+    return value % EMBED_DIM, 1.0 if (value >> 63) else -1.0
+
+
+def embed_batch(texts):
+    """
+    CPU-only hashing embedder: word unigrams plus character trigrams, L2-normalized.
+    Trigrams let paraphrases that share word stems ("dog"/"dogs") land close together.
+    """
+    matrix = np.zeros((len(texts), EMBED_DIM), dtype=np.float32)
+    for row, content in enumerate(texts):
+        for word in _WORD_RE.findall((content or "").lower()):
+            col, sign = _slot("w:" + word)
+            matrix[row, col] += sign
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                col, sign = _slot("c:" + padded[i:i + 3])
+                matrix[row, col] += 0.5 * sign
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _user_lock(user_id):
+    with _locks_guard:
+        return _locks.setdefault(user_id, threading.RLock())
+
+
+def _paths(user_id):
+    return (
+        os.path.join(VECTOR_DIR, f"u{int(user_id)}.vec"),
+        os.path.join(VECTOR_DIR, f"u{int(user_id)}.ids"),
+    )
+
+
+def has_vectors(user_id) -> bool:
+    return os.path.exists(_paths(user_id)[1])
+
+
+def append_vectors(user_id, memory_ids, vectors):
+    """Appends rows to the user's on-disk matrix. Vectors land before ids so readers never see a partial row."""
+    os.makedirs(VECTOR_DIR, exist_ok=True)
+    vec_path, ids_path = _paths(user_id)
+    with _user_lock(user_id):
+        with open(vec_path, "ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(ids_path, "ab") as f:
+            f.write(np.asarray(memory_ids, dtype=np.int64).tobytes())
+
+
+def _load(user_id):
+    """Memory-maps the user's matrix; the OS page cache does the rest."""
+    vec_path, ids_path = _paths(user_id)
+    if not os.path.exists(ids_path):
+        return None, None
+    count = os.path.getsize(ids_path) // 8
+    if count == 0:
+        return None, None
+    ids = np.memmap(ids_path, dtype=np.int64, mode="r", shape=(count,))
+    matrix = np.memmap(vec_path, dtype=np.float32, mode="r", shape=(count, EMBED_DIM))
+    return ids, matrix
+
+
+class _LSHIndex:
+    """Random-hyperplane LSH over a growing matrix; new rows are bucketed incrementally."""
+
+    def __init__(self):
+        rng = np.random.default_rng(1729)
+        self.planes = rng.standard_normal((LSH_TABLES, EMBED_DIM, LSH_BITS)).astype(np.float32)
+        self.weights = (1 << np.arange(LSH_BITS)).astype(np.int64)
+        self.buckets = [{} for _ in range(LSH_TABLES)]
+        self.size = 0
+
+    def _codes(self, vectors):
+        return [((vectors @ self.planes[t]) > 0).astype(np.int64) @ self.weights for t in range(LSH_TABLES)]
+
+    def extend(self, matrix):
+        if matrix.shape[0] <= self.size:
+            return
+        new_rows = np.asarray(matrix[self.size:])
+        for t, codes in enumerate(self._codes(new_rows)):
+            table = self.buckets[t]
+            for offset, code in enumerate(codes.tolist()):
+                table.setdefault(code, []).append(self.size + offset)
+        self.size = matrix.shape[0]
+
+    def candidates(self, query):
+        rows = set()
+        for t, codes in enumerate(self._codes(query[None, :])):
+            rows.update(self.buckets[t].get(int(codes[0]), ()))
+        return np.fromiter(rows, dtype=np.int64, count=len(rows))
+
+
+def search(user_id, query: str, k: int = 3):
+    """
+    Vectorized cosine top-k over the user's stored embeddings.
+    Returns [(memory_id, score)] best first. Only the query itself is embedded here.
+    """
+    ids, matrix = _load(user_id)
+    if ids is None:
+        return []
+    query_vec = embed_batch([query])[0]
+
+    rows = None
+    if matrix.shape[0] >= ANN_THRESHOLD:
+        with _user_lock(user_id):
+            index = _ann_cache.setdefault(user_id, _LSHIndex())
+            index.extend(matrix)
+        rows = index.candidates(query_vec)
+        if rows.size < k:
+            rows = None  # Too few candidates in the probed buckets; fall back to the exact scan
+
+    if rows is None:
+        scores = matrix @ query_vec
+        rows = np.arange(scores.shape[0])
+    else:
+        scores = np.asarray(matrix[rows]) @ query_vec
+
+    top = min(k, scores.shape[0])
+    best = np.argpartition(-scores, top - 1)[:top]
+    best = best[np.argsort(-scores[best])]
+    return [(int(ids[rows[i]]), float(scores[i])) for i in best]
+
+
+def index_memories(user_id, memories):
+    """Embeds [(memory_id, content)] in one batch and appends them to the user's matrix."""
+    if not memories:
+        return
+    vectors = embed_batch([content for _, content in memories])
+    append_vectors(user_id, [memory_id for memory_id, _ in memories], vectors)
+
+
+def backfill_user(user_id):
+    """Background job: embeds every memory a user had before semantic mode was switched on."""
+    db = SessionLocal()
+    try:
+        # Held across read and append so concurrent commits either land in this batch or after it.
+        with _user_lock(user_id):
+            if has_vectors(user_id):
+                return {"vectors_indexed": 0}
+            rows = db.query(ExperienceMemory.id, ExperienceMemory.content).filter(
+                ExperienceMemory.user_id == user_id
+            ).order_by(ExperienceMemory.id).all()
+            os.makedirs(VECTOR_DIR, exist_ok=True)
+            open(_paths(user_id)[1], "ab").close()
+            index_memories(user_id, [(row.id, row.content) for row in rows])
+        return {"vectors_indexed": len(rows)}
+    finally:
+        db.close()
+
+
+# --- Write-time indexing: every committed ExperienceMemory insert is embedded in one batch per commit ---
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_new_memories(session, flush_context):
+    if not SEMANTIC_ENABLED:
+        return
+    pending = session.info.setdefault("pending_vectors", [])
+    for obj in session.new:
+        if isinstance(obj, ExperienceMemory) and obj.id is not None:
+            pending.append((obj.user_id, obj.id, obj.content))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _embed_new_memories(session):
+    pending = session.info.pop("pending_vectors", None)
+    if not pending:
+        return
+    by_user = {}
+    for user_id, memory_id, content in pending:
+        by_user.setdefault(user_id, []).append((memory_id, content))
+    for user_id, memories in by_user.items():
+        try:
+            with _user_lock(user_id):
+                # Users without a matrix yet get their full history via backfill_user instead.
+                if has_vectors(user_id):
+                    index_memories(user_id, memories)
+        except Exception as e:
+            print(f"Vector Index Error: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_new_memories(session):
+    session.info.pop("pending_vectors", None)
@@ -0,0 +1,164 @@
+import asyncio
+import os
+import queue
+import threading
+import time
+from collections import deque
+from .database import IS_VERCEL
+
+# Configuration — Background Bookkeeping
+# A frozen serverless instance never runs queued jobs after the response, so Vercel defaults to inline.
+INTAKE_WORKERS = int(os.getenv("INTAKE_WORKERS", "0" if IS_VERCEL else "2"))  # 0 = run jobs inline (serverless)
+MEMORY_KEEP_WORKERS = int(os.getenv("MEMORY_KEEP_WORKERS", "0" if IS_VERCEL else "1"))  # Stream flushes; 0 = inline
+LATENCY_WINDOW = 200  # Recent job durations kept for percentiles
+
+
+class JobQueue:
+    """
+    A small in-process job queue drained by a pool of daemon worker threads.
+    Bookkeeping jobs land here so the chat turn never waits on them (mk3: Decoupled Memory Decisions).
+    """
+
+    def __init__(self, name: str, workers: int = 2):
+        self.name = name
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "deduplicated": 0}
+        self._pending_keys = set()
+        self._totals = {}
+        self._last_error = None
+
+    def start(self):
+        """Spawns the worker pool once. Safe to call repeatedly."""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"{self.name}-worker-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, fn, *args, **kwargs):
+        """Enqueues a job. With no workers configured the job runs inline."""
+        with self._lock:
+            self._counters["submitted"] += 1
+        if self.workers <= 0:
+            self._run(fn, args, kwargs, time.perf_counter())
+            return
+        self.start()
+        self._queue.put((fn, args, kwargs, time.perf_counter()))
+
+    def submit_once(self, key, fn, *args, **kwargs):
+        """
+        Like submit(), but a job with the same key that is still queued or running absorbs
+        this one. Returns False when deduplicated.
+        """
+        with self._lock:
+            if key in self._pending_keys:
+                self._counters["deduplicated"] += 1
+                return False
+            self._pending_keys.add(key)
+        self.submit(self._release_key, key, fn, *args, **kwargs)
+        return True
+
+    def _release_key(self, key, fn, *args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending_keys.discard(key)
+
+    def join(self, timeout: float = 5.0):
+        """Waits (bounded) for queued jobs to finish, e.g. on shutdown."""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def _worker(self):
+        while True:
+            fn, args, kwargs, enqueued_at = self._queue.get()
+            try:
+                self._run(fn, args, kwargs, enqueued_at)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, fn, args, kwargs, enqueued_at):
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            print(f"[{self.name}] Job Error: {e}")
+            with self._lock:
+                self._counters["failed"] += 1
+                self._last_error = str(e)
+            return
+        finished = time.perf_counter()
+
+        with self._lock:
+            self._counters["completed"] += 1
+            self._latencies.append((started - enqueued_at, finished - started))
+            # Jobs may report numeric counters (e.g. tokens spent) to be summed here.
+            if isinstance(result, dict):
+                for key, value in result.items():
+                    if isinstance(value, (int, float)):
+                        self._totals[key] = self._totals.get(key, 0) + value
+
+    def stats(self):
+        """Queue depth, job counters and latency percentiles (milliseconds)."""
+        with self._lock:
+            waits = sorted(w for w, _ in self._latencies)
+            runs = sorted(r for _, r in self._latencies)
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queue_depth": self._queue.qsize(),
+                "pending_keys": len(self._pending_keys),
+                **self._counters,
+                "totals": dict(self._totals),
+                "wait_ms": latency_percentiles(waits),
+                "run_ms": latency_percentiles(runs),
+                "last_error": self._last_error,
+            }
+
+
+def submit_or_defer(queue_, deferred, fn, *args, key=None):
+    """
+    queue_.submit(fn, *args) (submit_once under `key`). A queue without workers would run the
+    job inline, so when `deferred` is a list (the async path, on the event loop) the submit is
+    collected there instead, for run_deferred() to execute on a thread.
+    """
+    submit = (lambda: queue_.submit_once(key, fn, *args)) if key else (lambda: queue_.submit(fn, *args))
+    if deferred is not None and queue_.workers <= 0:
+        deferred.append(submit)
+    else:
+        submit()
+
+
+async def run_deferred(deferred):
+    """Runs the submits collected by submit_or_defer off the event loop (inline jobs included)."""
+    while deferred:
+        await asyncio.to_thread(deferred.pop(0))
+
+
+def latency_percentiles(samples):
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+
+    def pick(q):
+        return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 1)
+
+    return {"p50": pick(0.50), "p95": pick(0.95), "max": round(samples[-1] * 1000, 1)}
+
+
+# Shared queue for Intake Valve importance assessments (27B).
+intake_queue = JobQueue("intake", workers=INTAKE_WORKERS)
+
+# Memory Keep (4B sift + Stream flush), at most one queued or running job per user.
+memory_keep_queue = JobQueue("memory_keep", workers=MEMORY_KEEP_WORKERS)
+
+# Periodic Experience Memory compaction: its own thread (never inline), so a long all-users
+# sweep neither holds up Memory Keeps nor blocks the event loop. The DB lease spans processes.
+compaction_queue = JobQueue("compaction", workers=1)